@@ -1,6 +1,7 @@
 import streamlit as st
 import json
 from streamlit_lottie import st_lottie
+from asset_utils import minified_path
 from style_utils import load_global_css
 
 # --- PAGE CONFIG ---
@@ -14,10 +15,11 @@ st.set_page_config(
 
 load_global_css()
 
+@st.cache_data
 def load_lottie_local(filepath: str):
-    """ Loads a Lottie file from a local path. """
+    """ Loads a Lottie file from a local path (its pre-minified copy when there is one). """
     try:
-        with open(filepath, "r") as f:
+        with open(minified_path(filepath), "r") as f:
             return json.load(f)
     except FileNotFoundError:
         st.error(f"Error: Could not find Lottie file at {filepath}")
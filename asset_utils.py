@@ -0,0 +1,70 @@
+"""
+Pre-minified Lottie animations.
+
+Regenerate after replacing an animation in assets/:
+    python -m asset_utils
+"""
+import glob
+import json
+import os
+import sys
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+# Sub-pixel precision is invisible at the sizes the animations are shown at
+FLOAT_DIGITS = 3
+# Editor-only keys the player never reads: layer/shape match names and export metadata
+DROP_KEYS = ("mn", "meta")
+
+
+def _strip(node, digits):
+    if isinstance(node, dict):
+        return {k: _strip(v, digits) for k, v in node.items() if k not in DROP_KEYS}
+    if isinstance(node, list):
+        return [_strip(v, digits) for v in node]
+    if isinstance(node, float):
+        value = round(node, digits)
+        return int(value) if value.is_integer() else value
+    return node
+
+
+def minify_lottie(data, digits=FLOAT_DIGITS):
+    """ Lottie JSON with rounded floats and editor-only keys removed. """
+    return _strip(data, digits)
+
+
+def minified_path(path):
+    """ `x.json` -> `x.min.json` if that exists (and is not older), otherwise `path`. """
+    root, ext = os.path.splitext(path)
+    if root.endswith(".min"):
+        return path
+    candidate = f"{root}.min{ext}"
+    try:
+        if os.path.getmtime(candidate) >= os.path.getmtime(path):
+            return candidate
+    except OSError:
+        pass
+    return path
+
+
+def minify_assets(assets_dir=ASSETS_DIR):
+    """ Writes `<name>.min.json` next to each Lottie file; returns [(path, before, after)] sizes. """
+    written = []
+    for path in sorted(glob.glob(os.path.join(assets_dir, "*.json"))):
+        if path.endswith(".min.json"):
+            continue
+        with open(path) as f:
+            data = json.load(f)
+        out = f"{os.path.splitext(path)[0]}.min.json"
+        with open(out, "w") as f:
+            json.dump(minify_lottie(data), f, separators=(",", ":"))
+        written.append((out, os.path.getsize(path), os.path.getsize(out)))
+    return written
+
+
+def main():
+    for out, before, after in minify_assets(sys.argv[1] if len(sys.argv) > 1 else ASSETS_DIR):
+        print(f"{os.path.basename(out)}: {before / 1024:.1f} KB -> {after / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
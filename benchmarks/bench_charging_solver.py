@@ -0,0 +1,61 @@
+"""
+Charging-stop solver vs. the planner's original fixed-interval heuristic.
+
+Run from the repo root:  python -m benchmarks.bench_charging_solver
+"""
+import argparse
+import time
+
+import numpy as np
+
+from routing.charging_solver import heuristic_trip_time_h, solve_charging_plan
+
+# Rated powers seen in data/ev_stations.xlsx
+POWER_MIX_KW = np.array([3.3, 7.0, 15.0, 22.0, 50.0, 142.0])
+
+
+def synthetic_candidates(total_km, n_candidates, rng):
+    positions = np.sort(rng.uniform(0, total_km, n_candidates))
+    powers = rng.choice(POWER_MIX_KW, n_candidates)
+    detours = rng.uniform(0, 5, n_candidates)
+    return positions, powers, detours
+
+
+def run(total_kms=(400, 800, 1500), candidate_counts=(50, 200, 500), repeats=5, seed=42,
+        battery_kwh=60, ev_range_km=250, avg_speed_kmh=70):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for total_km in total_kms:
+        for n in candidate_counts:
+            positions, powers, detours = synthetic_candidates(total_km, n, rng)
+            timings = []
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                plan = solve_charging_plan(positions, powers, total_km, battery_kwh, ev_range_km,
+                                           avg_speed_kmh, detour_km=detours)
+                timings.append(time.perf_counter() - t0)
+            rows.append({
+                "total_km": total_km,
+                "candidates": n,
+                "solve_ms": 1000 * float(np.median(timings)),
+                "stops": len(plan["stops"]),
+                "solver_trip_h": plan["total_time_h"],
+                "heuristic_trip_h": heuristic_trip_time_h(total_km, battery_kwh, ev_range_km, avg_speed_kmh),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'km':>6} {'cands':>6} {'solve ms':>9} {'stops':>6} {'solver h':>9} {'heuristic h':>12}")
+    for r in run(repeats=args.repeats, seed=args.seed):
+        print(f"{r['total_km']:>6} {r['candidates']:>6} {r['solve_ms']:>9.1f} {r['stops']:>6} "
+              f"{r['solver_trip_h']:>9.2f} {r['heuristic_trip_h']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
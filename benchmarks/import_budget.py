@@ -0,0 +1,94 @@
+"""
+Import-time budget for the Streamlit pages.
+
+Run from the repo root:
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --runs 5 --verbose
+
+Each page's top-level imports are replayed in a fresh interpreter under
+`python -X importtime`; the page's cost is the sum of the cumulative times
+of the modules it imports directly (best of --runs). Exits with status 1 when
+a page is over its budget, so a new eager import of a heavy library shows up
+before it reaches users as a slower first paint.
+"""
+import argparse
+import ast
+import os
+import re
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Milliseconds on the reference machine (single core); roughly 1.5x the measured cost
+PAGE_BUDGETS_MS = {
+    "Home.py": 1000,
+    "pages/EV_Trip_Planner.py": 600,
+    "pages/Infra_Management.py": 1300,
+}
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def page_imports(path):
+    """ Import statements at the top level of a page, as source lines. """
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def measure_imports(statements, cwd=REPO_ROOT):
+    """
+    Runs the statements in a fresh interpreter with -X importtime.
+    Returns {top-level module: cumulative ms} for modules they imported.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(statements)],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing page modules failed:\n{proc.stderr[-2000:]}")
+    # -X importtime lists a module after its dependencies, with nested imports
+    # indented; unindented lines are the ones the statements triggered directly.
+    totals = {}
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if m and len(m.group(3)) == 1:
+            totals[m.group(4)] = int(m.group(2)) / 1000
+    return totals
+
+
+def page_cost(path, runs=3):
+    """ (best total ms, per-module ms of that run) for a page's top-level imports. """
+    statements = page_imports(os.path.join(REPO_ROOT, path))
+    best = None
+    for _ in range(runs):
+        modules = measure_imports(statements)
+        total = sum(modules.values())
+        if best is None or total < best[0]:
+            best = (total, modules)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--verbose", action="store_true", help="list the slowest modules of each page")
+    args = parser.parse_args(argv)
+
+    over = 0
+    print(f"{'page':<30} {'import ms':>10} {'budget':>8}")
+    for path, budget in PAGE_BUDGETS_MS.items():
+        total, modules = page_cost(path, args.runs)
+        flag = "  OVER BUDGET" if total > budget else ""
+        over += bool(flag)
+        print(f"{path:<30} {total:>10.0f} {budget:>8}{flag}")
+        if args.verbose:
+            for name, ms in sorted(modules.items(), key=lambda kv: -kv[1])[:8]:
+                print(f"    {name:<40} {ms:>8.0f}")
+    if over:
+        print(f"{over} page(s) over their import-time budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Local stand-ins for Nominatim, OpenRouteService and MapmyIndia.
+
+Run from the repo root:  python -m benchmarks.stub_server --port 8765
+
+Point the planner at it with configure_providers() or the EVISION_*_URL
+variables (see routing.providers). Responses are deterministic: routes are
+densified, gently winding lines between the two endpoints.
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import polyline
+
+CITIES = {
+    "nagpur": (21.1458, 79.0882),
+    "pune": (18.5204, 73.8567),
+    "mumbai": (19.0760, 72.8777),
+    "delhi": (28.6139, 77.2090),
+    "new delhi": (28.6139, 77.2090),
+    "chennai": (13.0827, 80.2707),
+    "kolkata": (22.5726, 88.3639),
+    "ahmedabad": (23.0225, 72.5714),
+}
+# Roughly the vertex spacing of an ORS driving route
+VERTEX_SPACING_KM = 0.05
+ROAD_SPEED_KMH = 60.0
+
+
+def synthetic_route(start, end, spacing_km=VERTEX_SPACING_KM):
+    """ (lat, lon) vertices from start to end, with a few km of sideways wobble. """
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    straight_km = float(np.hypot(*(end - start)) * 111.0)
+    n = max(2, int(straight_km / spacing_km))
+    t = np.linspace(0.0, 1.0, n)
+    pts = start + t[:, None] * (end - start)
+    normal = np.array([-(end - start)[1], (end - start)[0]])
+    normal /= max(np.hypot(*normal), 1e-12)
+    pts += np.outer(0.03 * np.sin(t * np.pi * 6), normal)
+    return pts, straight_km
+
+
+def _places(keyword, lat, lon, n=5):
+    return [
+        {
+            "placeName": f"{keyword.replace('+', ' ').title()} {i + 1}",
+            "placeAddress": f"Near {lat:.3f}, {lon:.3f}",
+            "distance": 150 * (i + 1),
+            "eLoc": f"STUB{i}",
+        }
+        for i in range(n)
+    ]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/search":
+            coords = CITIES.get(" ".join(query.get("q", [""])[0].split()).lower())
+            self._send([{"lat": str(coords[0]), "lon": str(coords[1])}] if coords else [])
+        elif url.path == "/api/places/nearby/json":
+            lat, lon = (float(v) for v in query["refLocation"][0].split(","))
+            self._send({"suggestedLocations": _places(query["keywords"][0], lat, lon)})
+        else:
+            self._send({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/v2/directions/"):
+            (lon1, lat1), (lon2, lat2) = json.loads(body)["coordinates"]
+            pts, straight_km = synthetic_route((lat1, lon1), (lat2, lon2))
+            self._send({"routes": [{
+                "geometry": polyline.encode([tuple(p) for p in pts]),
+                "summary": {"distance": straight_km * 1000, "duration": straight_km / ROAD_SPEED_KMH * 3600},
+            }]})
+        elif self.path == "/api/security/oauth/token":
+            self._send({"access_token": "stub-token", "expires_in": 3600})
+        else:
+            self._send({"error": "not found"}, status=404)
+
+
+def start_stub_server(port=0):
+    """ Serves in a daemon thread; returns (server, base_url). Call server.shutdown() to stop. """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+    print(f"Stub providers on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Latency benchmark suite with regression checks against a stored baseline.
+
+Run from the repo root:
+    python -m benchmarks.suite                      # compare with benchmarks/baseline.json
+    python -m benchmarks.suite --quick --out run.json
+    python -m benchmarks.suite --update-baseline
+
+Exits with status 1 when any case is slower than the baseline by more than
+the tolerance, so it can gate a release. Data is synthetic and seeded; the
+end-to-end case talks to benchmarks.stub_server, never to the real APIs.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SEED = 42
+# A case regresses when its best time is this much slower than the baseline's.
+# Best-of-N is compared rather than the median: on shared machines scheduler
+# noise only ever adds time, so the minimum is the stable statistic.
+TOLERANCE = 0.25
+# ...and the slowdown is also larger than this (keeps sub-millisecond noise out)
+MIN_DELTA_MS = 2.0
+
+POLYLINE_SIZES = (1_000, 10_000, 100_000)
+CLUSTER_SIZES = (1_000, 10_000, 50_000)
+PLOT_SIZES = (500, 5_000, 50_000)
+QUICK_SIZES = {"polyline": (1_000, 10_000), "cluster": (1_000,), "plot": (500,)}
+ORIGIN = (21.1458, 79.0882)  # Nagpur
+
+
+def measure(fn, repeats, warmup=1):
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "repeats": repeats}
+
+
+def _rng(seed, n):
+    # Seeded per case size, so a case sees the same data whichever cases run before it
+    return np.random.default_rng([seed, n])
+
+
+def synthetic_polyline(n, rng, step_km=0.05):
+    """ Random-walk route of n vertices about step_km apart, heading roughly north-west. """
+    heading = np.cumsum(rng.normal(0, 0.05, n)) + np.radians(135)
+    step_deg = step_km / 111.0
+    dlat = step_deg * np.cos(heading)
+    dlon = step_deg * np.sin(heading)
+    pts = np.empty((n, 2))
+    pts[0] = ORIGIN
+    pts[1:, 0] = ORIGIN[0] + np.cumsum(dlat[1:])
+    pts[1:, 1] = ORIGIN[1] + np.cumsum(dlon[1:])
+    return pts
+
+
+def synthetic_stations(n, rng, n_centres=8):
+    """ Station-like points: Gaussian blobs around random centres in central India. """
+    centres = rng.uniform((18.0, 73.0), (28.0, 88.0), size=(n_centres, 2))
+    which = rng.integers(n_centres, size=n)
+    pts = centres[which] + rng.normal(0, 0.08, size=(n, 2))
+    return pd.DataFrame({'latitude': pts[:, 0], 'longitude': pts[:, 1],
+                         'city': pd.Categorical([f"City {i}" for i in which])})
+
+
+def bench_distances(sizes, seed):
+    from routing.geometry import cumulative_distance_km
+    results = {}
+    for n in sizes:
+        pts = synthetic_polyline(n, _rng(seed, n))
+        for method in ("ellipsoid", "haversine"):
+            results[f"distance/{method}/{n}"] = measure(lambda: cumulative_distance_km(pts, method=method), 5)
+    return results
+
+
+def bench_stop_placement(sizes, seed):
+    from routing.geometry import cumulative_distance_km, place_stops
+    from routing.stop_planner import plan_charging_stops
+    from spatial.station_index import get_station_index
+    get_station_index()  # index build is a one-off per process, not part of planning
+    results = {}
+    for n in sizes:
+        pts = synthetic_polyline(n, _rng(seed, n))
+        cum = cumulative_distance_km(pts)
+        results[f"stops/place_stops/{n}"] = measure(lambda: place_stops(cum, 200), 5)
+        path = pts.tolist()
+        results[f"stops/plan_charging_stops/{n}"] = measure(
+            lambda: plan_charging_stops(path, cum, 60, 250, 70, 50), 3
+        )
+    return results
+
+
+def bench_clustering(sizes, seed):
+    from sklearn.cluster import KMeans
+    from clustering.metrics import cluster_quality
+    from preprocessing.preprocess import scale_coordinates
+
+    def run(df):
+        scaled, _ = scale_coordinates(df)
+        labels = KMeans(n_clusters=5, n_init="auto", random_state=SEED).fit_predict(scaled)
+        cluster_quality(scaled, labels)
+
+    results = {}
+    for n in sizes:
+        df = synthetic_stations(n, _rng(seed, n))
+        results[f"clustering/scale_kmeans_quality/{n}"] = measure(lambda: run(df), 3)
+    return results
+
+
+def bench_plots(sizes, seed):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from visualization.plots import plot_clusters
+
+    def run(df):
+        fig = plot_clusters(df, 5)
+        fig.savefig(io.BytesIO(), format="png", dpi=100, bbox_inches="tight")
+        plt.close(fig)
+
+    results = {}
+    for n in sizes:
+        rng = _rng(seed, n)
+        df = synthetic_stations(n, rng)
+        df['Cluster'] = rng.integers(5, size=n)
+        results[f"plot/plot_clusters/{n}"] = measure(lambda: run(df), 3)
+    return results
+
+
+def _reset_http_caches(cache_root=None):
+    """ Drop the process-wide cache instances, optionally moving the cache root first. """
+    from routing import geocode_cache, places_cache, providers, route_cache
+    if cache_root is not None:
+        os.environ["EVISION_CACHE_DIR"] = cache_root
+    geocode_cache._default_cache = None
+    route_cache._default_cache = None
+    places_cache._default_cache = None
+    providers._token_caches.clear()
+
+
+def bench_end_to_end():
+    from benchmarks.stub_server import start_stub_server
+    from routing import lookups, providers
+    from routing.trip_planner import plan_trip
+
+    server, base_url = start_stub_server()
+    saved_urls, saved_limiter = dict(providers.PROVIDER_URLS), lookups.MAPMYINDIA_LIMITER
+    saved_cache_dir = os.environ.get("EVISION_CACHE_DIR")
+    providers.configure_providers(nominatim=base_url, ors=base_url, mapmyindia_auth=base_url,
+                                  mapmyindia_places=base_url)
+    # Measure our code, not the MapmyIndia quota
+    lookups.MAPMYINDIA_LIMITER = lookups.TokenBucket(rate=1e6, capacity=1e6)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            runs = iter(range(1000))
+
+            def cold():
+                _reset_http_caches(os.path.join(tmp, f"cold{next(runs)}"))
+                plan_trip("Nagpur", "Pune", 60, 250, 70)
+
+            results = {"e2e/plan_trip_cold": measure(cold, 3)}
+            _reset_http_caches(os.path.join(tmp, "warm"))
+            results["e2e/plan_trip_warm"] = measure(lambda: plan_trip("Nagpur", "Pune", 60, 250, 70), 5)
+    finally:
+        server.shutdown()
+        providers.PROVIDER_URLS.update(saved_urls)
+        lookups.MAPMYINDIA_LIMITER = saved_limiter
+        if saved_cache_dir is None:
+            os.environ.pop("EVISION_CACHE_DIR", None)
+        else:
+            os.environ["EVISION_CACHE_DIR"] = saved_cache_dir
+        _reset_http_caches()
+    return results
+
+
+def run(quick=False, seed=SEED):
+    sizes = QUICK_SIZES if quick else {"polyline": POLYLINE_SIZES, "cluster": CLUSTER_SIZES, "plot": PLOT_SIZES}
+    results = {}
+    results.update(bench_distances(sizes["polyline"], seed))
+    results.update(bench_stop_placement(sizes["polyline"], seed))
+    results.update(bench_clustering(sizes["cluster"], seed))
+    results.update(bench_plots(sizes["plot"], seed))
+    results.update(bench_end_to_end())
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "quick": quick,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE, min_delta_ms=MIN_DELTA_MS):
+    """
+    Per case present in both runs: {"case", "baseline_ms", "current_ms", "ratio", "regressed"}.
+    Cases missing from either side are skipped.
+    """
+    rows = []
+    for case, current in results.items():
+        base = baseline.get(case)
+        if base is None:
+            continue
+        ratio = current["min_ms"] / base["min_ms"] if base["min_ms"] > 0 else float("inf")
+        regressed = ratio > 1 + tolerance and current["min_ms"] - base["min_ms"] > min_delta_ms
+        rows.append({"case": case, "baseline_ms": base["min_ms"], "current_ms": current["min_ms"],
+                     "ratio": ratio, "regressed": regressed})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, for a fast smoke run")
+    parser.add_argument("--out", default=None, help="write this run's results to a JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    report = run(quick=args.quick)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = None
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    rows = compare(report["results"], baseline, args.tolerance) if baseline else []
+    by_case = {r["case"]: r for r in rows}
+    print(f"{'case':<42} {'median ms':>10} {'best ms':>9} {'baseline':>9} {'ratio':>6}")
+    for case, r in report["results"].items():
+        cmp = by_case.get(case)
+        base = f"{cmp['baseline_ms']:>9.1f} {cmp['ratio']:>6.2f}" if cmp else f"{'-':>9} {'-':>6}"
+        flag = "  REGRESSED" if cmp and cmp["regressed"] else ""
+        print(f"{case:<42} {r['median_ms']:>10.1f} {r['min_ms']:>9.1f} {base}{flag}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    regressions = [r for r in rows if r["regressed"]]
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,12 @@
+import os
+
+def get_cache_dir(*parts):
+    """
+    Returns (and creates) a directory under the app's local cache root.
+    The root defaults to `.cache/` in the working directory and can be moved
+    with the EVISION_CACHE_DIR environment variable.
+    """
+    root = os.environ.get("EVISION_CACHE_DIR", ".cache")
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
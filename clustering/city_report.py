@@ -0,0 +1,199 @@
+"""
+Cluster every hot city in one batch and store a consolidated report.
+
+Run from the repo root:  python -m clustering.city_report --workers 4
+
+Each city with at least HOT_CITY_MIN_STATIONS stations gets the full k sweep
+of kmeans_service.sweep_city on a process pool, and k is chosen per city by
+the best silhouette. Cities whose stations are unchanged since the last
+report are carried over without refitting. The Infra page reads the report
+instead of fitting on demand.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+
+from cache_utils import get_cache_dir
+from clustering.kmeans_service import K_MAX, K_MIN, SWEEP_FORMAT, city_fingerprint, sweep_city
+from preprocessing.station_store import STATION_DATA_PATH, load_stations, station_data_version
+
+HOT_CITY_MIN_STATIONS = 10
+# Bump when the report layout changes; an old report is rebuilt from scratch
+REPORT_FORMAT = 1
+
+
+def hot_cities(df, min_stations=HOT_CITY_MIN_STATIONS):
+    """ {city: its stations} for cities with at least min_stations stations, as the page filters them. """
+    df = df[['latitude', 'longitude', 'city', 'name']].dropna()
+    counts = df['city'].value_counts()
+    return {city: df[df['city'] == city] for city in counts[counts >= min_stations].index}
+
+
+def select_k(sweep):
+    """ k with the best silhouette; ties go to the smaller k. """
+    scored = [(q, k) for k, q in ((k, entry["quality"]["silhouette"]) for k, entry in sweep.items())
+              if not np.isnan(q)]
+    if not scored:
+        return min(sweep)
+    return max(scored, key=lambda qk: (qk[0], -qk[1]))[1]
+
+
+def _init_worker():
+    # One BLAS/OpenMP thread per worker; the pool already uses every core
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+
+def analyze_city(city, city_df, k_min=K_MIN, k_max=K_MAX):
+    """ Sweep one city and summarize it. Runs in a pool worker. """
+    t0 = time.perf_counter()
+    sweep = sweep_city(city_df, k_min=k_min, k_max=k_max, n_jobs=1)
+    best_k = select_k(sweep)
+    return {
+        "fingerprint": city_fingerprint(city_df),
+        "n_stations": len(city_df),
+        "best_k": best_k,
+        "sweep": sweep,
+        "fit_s": time.perf_counter() - t0,
+    }
+
+
+def report_path():
+    return os.path.join(get_cache_dir("clusters"), "city_report.joblib")
+
+
+def _usable(report, k_min, k_max):
+    return (report is not None and report.get("format") == REPORT_FORMAT
+            and report.get("sweep_format") == SWEEP_FORMAT and report.get("k_range") == (k_min, k_max))
+
+
+def build_report(df, dataset_version=None, previous=None, workers=None, k_min=K_MIN, k_max=K_MAX,
+                 progress=None):
+    """
+    Report for every hot city of `df`. Cities whose fingerprint matches the
+    `previous` report are reused as they are; the rest are fitted on a
+    process pool of `workers` (default: CPU count). `progress(city, done, total)`
+    is called as each fitted city completes.
+    Returns the report dict; report["recomputed"] lists the cities fitted.
+    """
+    cities = hot_cities(df)
+    old = previous["cities"] if _usable(previous, k_min, k_max) else {}
+    entries, todo = {}, {}
+    for city, city_df in cities.items():
+        entry = old.get(city)
+        if entry is not None and entry["fingerprint"] == city_fingerprint(city_df):
+            entries[city] = entry
+        else:
+            todo[city] = city_df
+
+    workers = min(workers or os.cpu_count() or 1, max(len(todo), 1))
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            # Largest cities first so one big city does not finish last on an idle pool
+            futures = {pool.submit(analyze_city, city, city_df, k_min, k_max): city
+                       for city, city_df in sorted(todo.items(), key=lambda kv: -len(kv[1]))}
+            for done, future in enumerate(as_completed(futures), 1):
+                entries[futures[future]] = future.result()
+                if progress:
+                    progress(futures[future], done, len(todo))
+
+    return {
+        "format": REPORT_FORMAT,
+        "sweep_format": SWEEP_FORMAT,
+        "k_range": (k_min, k_max),
+        "dataset_version": dataset_version,
+        "created_at": time.time(),
+        "recomputed": sorted(todo),
+        "cities": dict(sorted(entries.items())),
+    }
+
+
+def save_report(report, path=None):
+    path = path or report_path()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(report, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+def load_report(path=None):
+    """ The stored report (memoized until the file changes), or None if there is none. """
+    path = path or report_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    report = joblib.load(path)
+    if report.get("format") != REPORT_FORMAT:
+        return None
+    with _loaded_lock:
+        _loaded[path] = (mtime, report)
+    return report
+
+
+def report_sweep(report, city, city_df, k_min=K_MIN, k_max=K_MAX):
+    """ The city's stored sweep if the report covers exactly these stations, else None. """
+    if not _usable(report, k_min, k_max):
+        return None
+    entry = report["cities"].get(city)
+    if entry is None or entry["fingerprint"] != city_fingerprint(city_df):
+        return None
+    return entry
+
+
+def report_summary(report):
+    """ One row per city: stations, chosen k and its metrics. """
+    rows = []
+    for city, entry in report["cities"].items():
+        quality = entry["sweep"][entry["best_k"]]["quality"]
+        rows.append({
+            "City": city, "Stations": entry["n_stations"], "Best K": entry["best_k"],
+            "Silhouette": round(quality["silhouette"], 3),
+            "Davies–Bouldin": round(quality["davies_bouldin"], 3),
+            "Calinski–Harabasz": round(quality["calinski_harabasz"], 1),
+        })
+    return rows
+
+
+def update_report(path=STATION_DATA_PATH, workers=None, full=False, progress=None):
+    """ Brings the stored report up to date with the station data and saves it. """
+    df = load_stations(path, columns=['latitude', 'longitude', 'city', 'name'])
+    previous = None if full else load_report()
+    report = build_report(df, station_data_version(path), previous, workers, progress=progress)
+    save_report(report)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default=STATION_DATA_PATH)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--full", action="store_true", help="refit every city, ignoring the stored report")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    report = update_report(args.data, args.workers, args.full,
+                           progress=lambda city, done, total: print(f"[{done}/{total}] {city}"))
+    print(f"{len(report['cities'])} hot cities, {len(report['recomputed'])} recomputed "
+          f"in {time.perf_counter() - t0:.1f} s -> {report_path()}")
+    for row in report_summary(report):
+        print(f"  {row['City']:<20} {row['Stations']:>5} stations  k={row['Best K']:<2} "
+              f"silhouette {row['Silhouette']:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+
+from cache_utils import get_cache_dir
+from clustering.metrics import cluster_quality
+from lazy_utils import lazy_import
+from preprocessing.preprocess import scale_coordinates
+from timing_utils import span
+
+# Stored sweeps load without sklearn; it is imported on the first fit
+sklearn_cluster = lazy_import("sklearn.cluster")
+
+K_MIN, K_MAX = 2, 10
+RANDOM_STATE = 42
+# Per-k time budget for the silhouette; larger cities fall back to a sampled estimate
+SCORE_BUDGET_S = 0.5
+# Bump when the stored sweep layout changes so old joblib files are refitted
+SWEEP_FORMAT = 2
+
+
+def _next_seed(scaled, centers, rng):
+    """ k-means++ style: pick one new seed with probability proportional to D^2. """
+    d2 = ((scaled[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+    total = d2.sum()
+    if total == 0:
+        return scaled[rng.integers(len(scaled))]
+    return scaled[rng.choice(len(scaled), p=d2 / total)]
+
+
+def _fit(scaled, k, init="k-means++", n_init="auto", random_state=RANDOM_STATE):
+    model = sklearn_cluster.KMeans(n_clusters=k, init=init, n_init=n_init, random_state=random_state)
+    labels = model.fit_predict(scaled)
+    return labels, model.cluster_centers_, float(model.inertia_)
+
+
+def sweep_city(city_df, k_min=K_MIN, k_max=K_MAX, random_state=RANDOM_STATE, n_jobs=-1):
+    """
+    Fits K-Means for every k in [k_min, k_max] on one city's stations.
+
+    The page's original cold fits run for all k in parallel. Alongside them,
+    each k is also warm-started from the best k-1 centroids plus one new
+    k-means++ seed, and the lower-inertia fit is kept. Silhouette scores, the
+    expensive part, are then computed for all k in parallel.
+    Returns {k: {"labels", "centers", "inertia", "quality"}} where "quality"
+    is the cluster_quality dict (silhouette, CI, Davies-Bouldin, Calinski-Harabasz).
+    """
+    with span("scale"):
+        scaled, scaler = scale_coordinates(city_df)
+    k_max = min(k_max, len(scaled))
+    ks = list(range(k_min, k_max + 1))
+    rng = np.random.default_rng(random_state)
+
+    with Parallel(n_jobs=n_jobs, prefer="threads") as parallel:
+        with span("fit"):
+            cold = parallel(delayed(_fit)(scaled, k, random_state=random_state) for k in ks)
+
+            results = {}
+            centers = None
+            for k, best in zip(ks, cold):
+                if centers is not None:
+                    init = np.vstack([centers, _next_seed(scaled, centers, rng)])
+                    warm = _fit(scaled, k, init=init, n_init=1, random_state=random_state)
+                    if warm[2] < best[2]:
+                        best = warm
+                labels, centers, inertia = best
+                results[k] = {
+                    "labels": labels.astype(np.int16),
+                    "centers": scaler.inverse_transform(centers),
+                    "inertia": inertia,
+                }
+
+        with span("score"):
+            scores = parallel(
+                delayed(cluster_quality)(scaled, results[k]["labels"], SCORE_BUDGET_S) for k in ks
+            )
+    for k, quality in zip(ks, scores):
+        results[k]["quality"] = quality
+    return results
+
+
+def city_fingerprint(city_df):
+    """ Hash of the city's coordinates in row order (labels are stored per row). """
+    coords = np.ascontiguousarray(city_df[['latitude', 'longitude']].to_numpy(dtype=np.float64))
+    return hashlib.sha1(coords.tobytes()).hexdigest()
+
+
+def _slug(city):
+    return re.sub(r"[^0-9a-z]+", "-", str(city).lower()).strip("-")
+
+
+def _sweep_path(city, dataset_version):
+    return os.path.join(get_cache_dir("clusters", dataset_version[:16]), f"{_slug(city)}.joblib")
+
+
+def carry_over_sweeps(old_version, new_version, cities):
+    """
+    Links the stored sweep of every city in `cities` ({city: its stations in
+    the new version}) from the old dataset version to the new one, when it
+    was fitted on exactly these rows in this order; the rest are refitted.
+    Returns the number of sweeps carried over.
+    """
+    old_dir = get_cache_dir("clusters", old_version[:16])
+    new_dir = get_cache_dir("clusters", new_version[:16])
+    fingerprints = {f"{_slug(city)}.joblib": city_fingerprint(city_df) for city, city_df in cities.items()}
+    carried = 0
+    for name in os.listdir(old_dir):
+        target = os.path.join(new_dir, name)
+        if name not in fingerprints or os.path.exists(target):
+            continue
+        # Labels are per row: a reordered or edited city must not reuse them
+        if joblib.load(os.path.join(old_dir, name)).get("fingerprint") != fingerprints[name]:
+            continue
+        try:
+            os.link(os.path.join(old_dir, name), target)
+        except OSError:
+            shutil.copyfile(os.path.join(old_dir, name), target)
+        carried += 1
+    return carried
+
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+def get_city_clusters(city_df, city, dataset_version, k_min=K_MIN, k_max=K_MAX):
+    """
+    Memoized sweep for one city, keyed by city and dataset hash.
+    Loaded from the joblib file when present, otherwise fitted and persisted,
+    so moving the k slider is a lookup rather than a refit.
+    """
+    path = _sweep_path(city, dataset_version)
+    key = (path, k_min, k_max)
+    with _memo_lock:
+        if key in _memo:
+            return _memo[key]
+
+    sweep = None
+    fingerprint = city_fingerprint(city_df)
+    if os.path.exists(path):
+        stored = joblib.load(path)
+        if (stored.get("format") == SWEEP_FORMAT and stored.get("k_range") == (k_min, k_max)
+                and stored.get("fingerprint") == fingerprint):
+            sweep = stored["sweep"]
+    if sweep is None:
+        sweep = sweep_city(city_df, k_min=k_min, k_max=k_max)
+        tmp = path + ".tmp"
+        joblib.dump({"format": SWEEP_FORMAT, "k_range": (k_min, k_max), "n_stations": len(city_df),
+                     "fingerprint": fingerprint, "sweep": sweep}, tmp)
+        os.replace(tmp, path)
+
+    with _memo_lock:
+        _memo[key] = sweep
+    return sweep
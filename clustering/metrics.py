@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+
+from lazy_utils import lazy_import
+
+sklearn_metrics = lazy_import("sklearn.metrics")
+
+# Upper bound on the distance block held in memory at once
+WORKING_MEMORY_BYTES = 64 * 1024 * 1024
+MIN_SAMPLE = 30
+Z_95 = 1.96
+
+
+def _prepare(X, labels):
+    X = np.asarray(X, dtype=np.float64)
+    codes, labels = np.unique(labels, return_inverse=True)
+    counts = np.bincount(labels, minlength=len(codes)).astype(np.float64)
+    onehot = np.zeros((len(X), len(codes)))
+    onehot[np.arange(len(X)), labels] = 1.0
+    return X, labels, counts, onehot, (X ** 2).sum(axis=1)
+
+
+def silhouette_rows(X, labels, rows, chunk_size=None, prepared=None):
+    """
+    Exact per-point silhouette values for `rows`, measured against every point.
+
+    Distances are computed `chunk_size` rows at a time (sized from
+    WORKING_MEMORY_BYTES by default) and reduced straight to per-cluster sums,
+    so memory stays O(chunk_size * n) instead of O(n^2).
+    Points in singleton clusters get 0, as in sklearn.
+    """
+    X, labels, counts, onehot, sq_norms = prepared or _prepare(X, labels)
+    if chunk_size is None:
+        # a few float64 temporaries of shape (chunk, n) are alive per chunk
+        chunk_size = max(1, WORKING_MEMORY_BYTES // (3 * 8 * len(X)))
+    rows = np.asarray(rows)
+    out = np.empty(len(rows))
+    for start in range(0, len(rows), chunk_size):
+        idx = rows[start:start + chunk_size]
+        d2 = sq_norms[idx, None] + sq_norms[None, :] - 2.0 * X[idx] @ X.T
+        dist_sums = np.sqrt(np.maximum(d2, 0.0)) @ onehot
+        own = labels[idx]
+        own_count = counts[own]
+        a = dist_sums[np.arange(len(idx)), own] / np.maximum(own_count - 1, 1)
+        mean_other = dist_sums / counts
+        mean_other[np.arange(len(idx)), own] = np.inf
+        b = mean_other.min(axis=1)
+        s = (b - a) / np.maximum(np.maximum(a, b), 1e-12)
+        out[start:start + chunk_size] = np.where(own_count > 1, s, 0.0)
+    return out
+
+
+def chunked_silhouette(X, labels, chunk_size=None, prepared=None):
+    """ Exact silhouette score without materializing the full distance matrix. """
+    return float(silhouette_rows(X, labels, np.arange(len(X)), chunk_size, prepared).mean())
+
+
+def sampled_silhouette(X, labels, sample_size=2000, random_state=42, chunk_size=None, prepared=None):
+    """
+    Silhouette estimated from a uniform sample of points, each scored exactly
+    against the full dataset. Returns (estimate, (ci_low, ci_high)) with a
+    normal-approximation 95% confidence interval.
+    """
+    n = len(X)
+    if sample_size >= n:
+        score = chunked_silhouette(X, labels, chunk_size, prepared)
+        return score, (score, score)
+    rows = np.random.default_rng(random_state).choice(n, size=sample_size, replace=False)
+    values = silhouette_rows(X, labels, rows, chunk_size, prepared)
+    mean = float(values.mean())
+    # finite-population correction: the interval shrinks to zero as the sample approaches n
+    half = float(Z_95 * values.std(ddof=1) / np.sqrt(sample_size) * np.sqrt((n - sample_size) / (n - 1)))
+    return mean, (mean - half, mean + half)
+
+
+def cluster_quality(X, labels, time_budget_s=0.5, random_state=42):
+    """
+    Silhouette plus the cheap O(n) Davies-Bouldin and Calinski-Harabasz indices.
+
+    The cost of one exact silhouette row is timed on a small probe; if every
+    row fits in what is left of `time_budget_s` the exact chunked score is
+    used, otherwise as many sampled rows as the budget allows (at least MIN_SAMPLE).
+    """
+    start = time.perf_counter()
+    X = np.asarray(X, dtype=np.float64)
+    n = len(X)
+    n_labels = len(np.unique(labels))
+    result = {"silhouette": float("nan"), "silhouette_ci": None, "silhouette_method": None,
+              "n_evaluated": 0, "davies_bouldin": float("nan"), "calinski_harabasz": float("nan")}
+    if n_labels < 2 or n_labels > n - 1:
+        return result
+
+    result["davies_bouldin"] = float(sklearn_metrics.davies_bouldin_score(X, labels))
+    result["calinski_harabasz"] = float(sklearn_metrics.calinski_harabasz_score(X, labels))
+
+    prepared = _prepare(X, labels)
+    probe = np.random.default_rng(random_state).choice(n, size=min(n, 16), replace=False)
+    t0 = time.perf_counter()
+    silhouette_rows(X, labels, probe, prepared=prepared)
+    per_row_s = (time.perf_counter() - t0) / len(probe)
+
+    remaining_s = time_budget_s - (time.perf_counter() - start)
+    affordable = int(max(remaining_s, 0.0) / max(per_row_s, 1e-9))
+    if affordable >= n:
+        score = chunked_silhouette(X, labels, prepared=prepared)
+        result.update(silhouette=score, silhouette_ci=(score, score), silhouette_method="exact",
+                      n_evaluated=n)
+    else:
+        sample_size = min(max(MIN_SAMPLE, affordable), n)
+        score, ci = sampled_silhouette(X, labels, sample_size, random_state, prepared=prepared)
+        result.update(silhouette=score, silhouette_ci=ci, silhouette_method="sampled",
+                      n_evaluated=sample_size)
+    return result
@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lazy_utils import lazy_import
+from preprocessing.preprocess import fit_scaler_streaming
+
+sklearn_cluster = lazy_import("sklearn.cluster")
+
+CHUNK_ROWS = 500_000
+COORD_COLUMNS = ['latitude', 'longitude']
+
+
+def iter_chunks(source, columns=None, chunksize=CHUNK_ROWS):
+    """
+    Yields DataFrame chunks of at most `chunksize` rows with rows missing
+    coordinates dropped. `source` is a CSV/Parquet path or an in-memory DataFrame.
+    """
+    columns = list(columns) if columns is not None else list(COORD_COLUMNS)
+    if isinstance(source, pd.DataFrame):
+        chunks = (source.iloc[i:i + chunksize][columns] for i in range(0, len(source), chunksize))
+    elif str(source).endswith(".parquet"):
+        pf = pq.ParquetFile(source)
+        chunks = (b.to_pandas() for b in pf.iter_batches(batch_size=chunksize, columns=columns))
+    else:
+        chunks = pd.read_csv(source, usecols=columns, chunksize=chunksize)
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=COORD_COLUMNS)
+        if len(chunk):
+            yield chunk
+
+
+class StreamingKMeans:
+    """
+    Out-of-core clustering: a streamed StandardScaler (as in scale_coordinates)
+    followed by MiniBatchKMeans.partial_fit over the same chunks.
+    Memory is bounded by the chunk size, never by the input size.
+    """
+
+    def __init__(self, n_clusters, chunksize=CHUNK_ROWS, n_epochs=1, batch_size=4096, random_state=42):
+        self.n_clusters = n_clusters
+        self.chunksize = chunksize
+        self.n_epochs = n_epochs
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.scaler = None
+        self.model = None
+        self.n_samples_ = 0
+
+    def _transform(self, chunk):
+        return self.scaler.transform(chunk[COORD_COLUMNS])
+
+    def fit(self, source):
+        # Pass 1: scaler statistics; pass 2..: mini-batch updates
+        self.scaler = fit_scaler_streaming(iter_chunks(source, chunksize=self.chunksize))
+        self.model = sklearn_cluster.MiniBatchKMeans(
+            n_clusters=self.n_clusters, batch_size=self.batch_size,
+            random_state=self.random_state, n_init=3,
+        )
+        self.n_samples_ = 0
+        seed_buffer = []
+        for epoch in range(self.n_epochs):
+            for chunk in iter_chunks(source, chunksize=self.chunksize):
+                scaled = self._transform(chunk)
+                if epoch == 0:
+                    self.n_samples_ += len(scaled)
+                # The first partial_fit needs at least n_clusters rows to seed the centroids
+                if not hasattr(self.model, "cluster_centers_"):
+                    seed_buffer.append(scaled)
+                    if sum(len(b) for b in seed_buffer) < self.n_clusters:
+                        continue
+                    scaled = np.vstack(seed_buffer)
+                    seed_buffer = []
+                for start in range(0, len(scaled), self.batch_size):
+                    self.model.partial_fit(scaled[start:start + self.batch_size])
+        if not hasattr(self.model, "cluster_centers_"):
+            raise ValueError(f"Need at least {self.n_clusters} rows with coordinates to cluster")
+        return self
+
+    def predict(self, df):
+        return self.model.predict(self._transform(df))
+
+    @property
+    def cluster_centers_latlon(self):
+        return self.scaler.inverse_transform(self.model.cluster_centers_)
+
+    def assign(self, source, out_path, columns=None):
+        """
+        Labels every row out of core and writes the rows plus a `Cluster`
+        column to a Parquet file, one row group per chunk. Returns out_path.
+        """
+        columns = list(columns) if columns is not None else list(COORD_COLUMNS)
+        tmp = out_path + ".tmp"
+        writer = None
+        try:
+            for chunk in iter_chunks(source, columns=columns, chunksize=self.chunksize):
+                chunk = chunk.assign(Cluster=self.predict(chunk).astype(np.int16))
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            raise ValueError("No rows with coordinates to assign")
+        os.replace(tmp, out_path)
+        return out_path
+
+
+def sample_labeled(path, n=5000, random_state=42):
+    """
+    Uniform sample of a labeled Parquet file, read one row group at a time,
+    small enough to hand to plot_clusters.
+    """
+    pf = pq.ParquetFile(path)
+    total = pf.metadata.num_rows
+    frac = min(1.0, n / max(total, 1))
+    parts = [
+        pf.read_row_group(i).to_pandas().sample(frac=frac, random_state=random_state + i)
+        for i in range(pf.num_row_groups)
+    ]
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,28 @@
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access.
+    Resolved attributes are memoized, so later accesses cost a dict lookup.
+    """
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        value = getattr(module, attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        return f"<lazy module {self.__name__!r}>"
+
+
+def lazy_import(name):
+    """
+    `plt = lazy_import("matplotlib.pyplot")` defers the import cost of heavy
+    libraries to the code path that first uses them. Modules that are
+    already imported are returned as they are.
+    """
+    return sys.modules.get(name) or LazyModule(name)
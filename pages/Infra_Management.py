@@ -1,11 +1,19 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import joblib
-from sklearn.cluster import KMeans
-from preprocessing.preprocess import scale_coordinates
-from visualization.plots import plot_clusters
-from sklearn.metrics import silhouette_score
+from preprocessing.station_store import STATION_DATA_PATH, load_stations, station_data_version
+from clustering.kmeans_service import get_city_clusters
+from clustering.city_report import HOT_CITY_MIN_STATIONS, city_fingerprint, load_report, report_summary, report_sweep
+from clustering.metrics import cluster_quality
+from visualization.plots import render_clusters_png
+from spatial.density_tiles import get_density_tiles
+from spatial.coverage import SERVICE_RADIUS_KM, analyze_city, city_stations
+from lazy_utils import lazy_import
 from style_utils import load_global_css
+from timing_utils import ENABLED as TIMING_ENABLED, span, start_trace, finish_trace, show_timing_panel
+
+# Only the streaming engine needs it
+streaming = lazy_import("clustering.streaming")
 
 # --- PAGE CONFIG ---
 st.set_page_config(
@@ -27,51 +35,82 @@ st.markdown("<hr>", unsafe_allow_html=True)
 
 # --- Upload File ---
 st.sidebar.header("⚙️ Data Source")
-file_path = r"C:\Users\HP\Documents\EV_Project_Dashboard\EV_Project_Dashboard\data\ev_stations.xlsx"
+file_path = STATION_DATA_PATH
+page_trace = start_trace("infra")
+
+def stop_page():
+    # Ends the trace first; left open, it would collect the spans of later runs on this script thread
+    finish_trace(page_trace)
+    st.stop()
 
 try:
-    df = pd.read_excel(file_path, sheet_name='ev_locations')
+    # Cached Parquet copy of the sheet; the xlsx is only reparsed when it changes
+    with span("load"):
+        df = load_stations(file_path, columns=['latitude', 'longitude', 'city', 'name'])
     #st.sidebar.info(f"Loaded data from: `{file_path}`")
 except FileNotFoundError:
     st.error(f"❌ Error: File not found at `{file_path}`.")
-    st.info("Please update the `file_path` variable in `app.py` (line 30) to the correct location of your Excel file.")
-    st.stop()
+    st.info("Please set `EVISION_STATION_DATA` (or `STATION_DATA_PATH` in `preprocessing/station_store.py`) to the location of your station data.")
+    stop_page()
 except Exception as e:
     st.error(f"An error occurred while reading the file: {e}")
-    st.stop()
+    stop_page()
 
 # --- Data Cleaning ---
 if not {'latitude', 'longitude', 'city'}.issubset(df.columns):
     st.error("The file must contain 'latitude', 'longitude', and 'city' columns.")
-    st.stop()
+    stop_page()
 
 df = df[['latitude', 'longitude', 'city', 'name']].dropna()
 
 # --- Hot City Detection ---
 st.sidebar.header("📍 City Selection")
 city_counts = df['city'].value_counts()
-hot_cities = city_counts[city_counts >= 10].index.tolist()
+hot_cities = city_counts[city_counts >= HOT_CITY_MIN_STATIONS].index.tolist()
 
 if not hot_cities:
     st.error("❌ No cities with enough EV stations (≥10) found.")
-    st.stop()
+    stop_page()
 
 selected_city = st.sidebar.selectbox("Select a Hot City", sorted(hot_cities))
 city_df = df[df['city'] == selected_city]
 
 if len(city_df) < 3:
     st.warning(f"{selected_city} has too few stations to cluster.")
-    st.stop()
+    stop_page()
+
+# Precomputed by `python -m clustering.city_report`; cities it does not cover are fitted on demand
+report = load_report()
+report_entry = report_sweep(report, selected_city, city_df)
 
 # --- Cluster Count Selection ---
 max_clusters = min(10, len(city_df))
-k = st.sidebar.slider("Number of Clusters", 2, max_clusters, 3)
+default_k = report_entry["best_k"] if report_entry else 3
+k = st.sidebar.slider("Number of Clusters", 2, max_clusters, default_k,
+                      help="Defaults to the k with the best silhouette when the city report covers this city.")
+engine = st.sidebar.radio(
+    "Clustering Engine", ["K-Means (exact)", "MiniBatch (streaming)"],
+    help="The streaming engine fits chunk by chunk with bounded memory, for very large datasets."
+)
 
 # --- USE A SPINNER FOR CLUSTERING ---
 with st.spinner(f"Analyzing {selected_city}..."):
-    scaled_data, scaler = scale_coordinates(city_df)
-    kmeans = KMeans(n_clusters=k, random_state=42)
-    city_df['Cluster'] = kmeans.fit_predict(scaled_data)
+    if engine == "K-Means (exact)":
+        # All k in 2..10 are fitted once per city and dataset version; the slider only picks one
+        # Spans for scale/fit/score are recorded inside the sweep when it actually runs
+        with span("clusters"):
+            if report_entry:
+                sweep = report_entry["sweep"]
+            else:
+                sweep = get_city_clusters(city_df, selected_city, station_data_version(file_path))
+        city_df = city_df.assign(Cluster=sweep[k]["labels"])
+        quality = sweep[k]["quality"]
+    else:
+        with span("fit"):
+            stream_model = streaming.StreamingKMeans(n_clusters=k).fit(city_df)
+            city_df = city_df.assign(Cluster=stream_model.predict(city_df))
+        with span("score"):
+            quality = cluster_quality(stream_model.scaler.transform(city_df[['latitude', 'longitude']]), city_df['Cluster'])
     
     st.success(f"Analysis complete for {selected_city}!")
 
@@ -82,16 +121,73 @@ st.subheader(f"📊 Clusters in **{selected_city}** (K={k})")
 st.map(city_df[['latitude', 'longitude']])
 
 # --- Cluster Plot ---
-fig = plot_clusters(city_df, k)
-st.pyplot(fig)
+# Rendered once per (city, k, labels) and served from the PNG cache on reruns
+with span("plot"):
+    cluster_png = render_clusters_png(city_df, k, selected_city)
+st.image(cluster_png)
 
 # --- Data View ---
 with st.expander("📄 View Clustered Station Data"):
     st.dataframe(city_df)
     
 # After predicting clusters
-score = silhouette_score(scaled_data, city_df['Cluster'])
-st.success(f"🧠 Silhouette Score: {score:.3f}")
+score = quality["silhouette"]
+if quality["silhouette_method"] == "sampled":
+    low, high = quality["silhouette_ci"]
+    st.success(f"🧠 Silhouette Score: {score:.3f} (95% CI {low:.3f}–{high:.3f}, sampled from {quality['n_evaluated']} stations)")
+else:
+    st.success(f"🧠 Silhouette Score: {score:.3f}")
+st.caption(f"Davies–Bouldin: {quality['davies_bouldin']:.3f} • Calinski–Harabasz: {quality['calinski_harabasz']:.1f}")
+
+# --- Coverage Gaps ---
+st.subheader(f"🧭 Coverage Gaps & New Sites in {selected_city}")
+st.caption("Unlike cluster centroids, which describe existing stations, these sites fill the largest uncovered areas.")
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def coverage_summary(city, n_sites, radius_km, city_version):
+    # Only the small outputs are cached; the distance grid can have a million cells.
+    # Keyed by the city's own stations, so a new snapshot only recomputes cities it changed
+    result = analyze_city(df, city, n_sites, radius_km)
+    return result["sites"], {k: result[k] for k in ("cells", "covered_share", "covered_share_after", "mean_dist_km")}
+
+gap_cols = st.columns(2)
+n_sites = gap_cols[0].slider("New sites", 1, 10, 5)
+radius_km = gap_cols[1].slider("Service radius (km)", 0.5, 5.0, SERVICE_RADIUS_KM, 0.5)
+if st.checkbox("Find coverage gaps", help="Scores a ~50 m grid over the whole city; takes a few seconds per city."):
+    with span("coverage"), st.spinner("Scoring coverage..."):
+        sites, summary = coverage_summary(selected_city, n_sites, radius_km, city_fingerprint(city_stations(df, selected_city)))
+    metric_cols = st.columns(3)
+    metric_cols[0].metric("Covered now", f"{summary['covered_share']:.0%}")
+    metric_cols[1].metric("With new sites", f"{summary['covered_share_after']:.0%}",
+                          f"{summary['covered_share_after'] - summary['covered_share']:+.0%}")
+    metric_cols[2].metric("Mean distance to a station", f"{summary['mean_dist_km']:.2f} km")
+    existing = city_stations(df, selected_city).assign(color='#888888')
+    st.map(pd.concat([existing, sites[['latitude', 'longitude']].assign(color='#00c853')]), color='color')
+    st.dataframe(sites.rename(columns={'new_covered_km2': 'New coverage (km²)'}), use_container_width=True)
+    st.caption(f"{summary['cells']:,} grid cells scored. Grey: existing stations, green: recommended sites.")
+
+# --- Nationwide Density ---
+# Precomputed tiles: one point per occupied tile instead of every station
+st.subheader("🇮🇳 Nationwide Station Density")
+with span("density"):
+    tiles = get_density_tiles(file_path)
+    detail = st.select_slider("Detail level (map zoom)", options=list(tiles.levels), value=tiles.levels[len(tiles.levels) // 2])
+    density = tiles.query(tiles.bounds(), detail)
+    # Circle area proportional to the station count, the largest filling its tile
+    tile_m = 40_075_000 / (1 << detail) * np.cos(np.radians(density['latitude']))
+    density = density.assign(radius=tile_m / 2 * np.sqrt(density['count'] / density['count'].max()))
+st.map(density, size='radius', color='#ff4b4b88')
+st.caption(f"{len(density)} tiles covering {tiles.total} stations.")
+
+# --- All Hot Cities ---
+if report:
+    with st.expander("🏙️ All Hot Cities (best K per city)"):
+        st.dataframe(report_summary(report), use_container_width=True)
+        st.caption("From the city report; refresh it with `python -m clustering.city_report`.")
+
+timings = finish_trace(page_trace)
+if TIMING_ENABLED and st.sidebar.checkbox("⏱️ Show timing breakdown"):
+    show_timing_panel(timings)
 
 # --- Footer ---
 st.markdown("---")
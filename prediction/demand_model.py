@@ -0,0 +1,230 @@
+"""
+Train, update and query the charging-demand model.
+
+Run from the repo root:
+    python -m prediction.demand_model train
+    python -m prediction.demand_model update
+    python -m prediction.demand_model predict --city Nagpur --out nagpur_demand.parquet
+"""
+import argparse
+import glob
+import os
+import re
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDRegressor
+from sklearn.neighbors import BallTree
+from sklearn.preprocessing import StandardScaler
+
+from cache_utils import get_cache_dir
+from preprocessing.station_store import STATION_DATA_PATH, station_data_version
+from prediction.features import (
+    CELL_KM, FEATURE_COLUMNS, GRID_PAD_KM, RING_RADII_KM,
+    DemandFeatures, city_grids, grid_cells, load_demand_stations,
+)
+from spatial.station_index import EARTH_RADIUS_KM
+
+RANDOM_STATE = 42
+FIT_EPOCHS = 20
+UPDATE_EPOCHS = 5
+BATCH_SIZE = 1024
+# Bump when the stored model layout changes; older artifacts are not loaded
+MODEL_FORMAT = 1
+
+
+class DemandModel:
+    """
+    Predicts log1p(installed kW within 1 km) of a grid cell from its
+    spatial context (see prediction.features).
+
+    The regressor is trained with partial_fit only, so update() can continue
+    from the stored weights using just the cells affected by new stations.
+    The feature scaler and station clusters are frozen after fit() so
+    features keep their meaning across updates.
+    """
+
+    def __init__(self, cell_km=CELL_KM, random_state=RANDOM_STATE):
+        self.cell_km = cell_km
+        self.random_state = random_state
+        self.scaler = None
+        self.regressor = None
+        self.clusters = None
+        self.seen_keys = np.zeros(0, dtype=np.uint64)
+        self.n_samples_ = 0
+        self.version = 0
+        self.dataset_version = None
+
+    def _partial_fit(self, X, y, epochs):
+        rng = np.random.default_rng(self.random_state + self.n_samples_)
+        X = self.scaler.transform(X)
+        for _ in range(epochs):
+            order = rng.permutation(len(X))
+            for start in range(0, len(X), BATCH_SIZE):
+                batch = order[start:start + BATCH_SIZE]
+                self.regressor.partial_fit(X[batch], y[batch])
+        self.n_samples_ += len(X)
+
+    def fit(self, stations, epochs=FIT_EPOCHS):
+        """ Train from scratch on every city grid. Returns the number of cells used. """
+        features = DemandFeatures(stations)
+        cells = city_grids(stations, self.cell_km)
+        X = features.transform(cells['latitude'], cells['longitude'])
+        y = np.log1p(features.target(cells['latitude'], cells['longitude']))
+
+        self.clusters = features.clusters
+        self.scaler = StandardScaler().fit(X)
+        self.regressor = SGDRegressor(loss="huber", alpha=1e-4, learning_rate="invscaling",
+                                      eta0=0.01, random_state=self.random_state)
+        self.n_samples_ = 0
+        self._partial_fit(X, y, epochs)
+        self.seen_keys = np.unique(stations['station_key'].to_numpy(dtype=np.uint64))
+        return len(cells)
+
+    def update(self, stations, epochs=UPDATE_EPOCHS):
+        """
+        Continue training with only the cells whose features or target can have
+        changed: cells within the widest feature radius of a station the model
+        has not seen yet. Returns the number of cells used (0 if nothing is new).
+        """
+        if self.regressor is None:
+            return self.fit(stations)
+        keys = stations['station_key'].to_numpy(dtype=np.uint64)
+        new = ~np.isin(keys, self.seen_keys)
+        if not new.any():
+            return 0
+
+        fresh = stations[new]
+        features = DemandFeatures(stations, clusters=self.clusters)
+        cells = city_grids(stations[stations['city'].isin(fresh['city'].unique())], self.cell_km)
+        fresh_tree = BallTree(np.radians(fresh[['latitude', 'longitude']].to_numpy(dtype=np.float64)), metric='haversine')
+        near = fresh_tree.query_radius(
+            np.radians(cells[['latitude', 'longitude']].to_numpy(dtype=np.float64)),
+            max(RING_RADII_KM) / EARTH_RADIUS_KM, count_only=True,
+        ) > 0
+        cells = cells[near]
+        X = features.transform(cells['latitude'], cells['longitude'])
+        y = np.log1p(features.target(cells['latitude'], cells['longitude']))
+        self._partial_fit(X, y, epochs)
+        self.seen_keys = np.union1d(self.seen_keys, keys)
+        return len(cells)
+
+    def predict(self, features, lat, lon):
+        """ Predicted installed-kW demand at each point, for a DemandFeatures snapshot. """
+        X = self.scaler.transform(features.transform(lat, lon))
+        return np.maximum(np.expm1(self.regressor.predict(X)), 0.0)
+
+    def predict_grid(self, stations, city=None, bbox=None, cell_km=None, pad_km=GRID_PAD_KM):
+        """
+        Demand over a whole grid in one vectorized call: the grid of `city`, of a
+        (lat_min, lon_min, lat_max, lon_max) bbox, or of every city when neither
+        is given. Returns a DataFrame with latitude, longitude, demand_kw.
+        """
+        cell_km = cell_km or self.cell_km
+        features = DemandFeatures(stations, clusters=self.clusters)
+        if bbox is not None:
+            lat, lon = grid_cells([bbox[0], bbox[2]], [bbox[1], bbox[3]], cell_km, pad_km=0.0)
+            cells = pd.DataFrame({'latitude': lat, 'longitude': lon})
+        else:
+            subset = stations if city is None else stations[stations['city'] == city]
+            cells = city_grids(subset, cell_km, pad_km)
+        return cells.assign(demand_kw=self.predict(features, cells['latitude'], cells['longitude']))
+
+    def feature_weights(self):
+        return dict(zip(FEATURE_COLUMNS, self.regressor.coef_.tolist()))
+
+
+def _model_dir():
+    return get_cache_dir("models", "demand")
+
+
+def model_versions():
+    """ Stored artifact versions, oldest first. """
+    versions = []
+    for path in glob.glob(os.path.join(_model_dir(), "demand-v*.joblib")):
+        m = re.search(r"demand-v(\d+)\.joblib$", path)
+        if m:
+            versions.append(int(m.group(1)))
+    return sorted(versions)
+
+
+def save_demand_model(model, dataset_version=None):
+    """ Writes the model as the next immutable version and returns its path. """
+    versions = model_versions()
+    model.version = (versions[-1] if versions else 0) + 1
+    model.dataset_version = dataset_version
+    path = os.path.join(_model_dir(), f"demand-v{model.version:04d}.joblib")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    joblib.dump({"format": MODEL_FORMAT, "saved_at": time.time(), "model": model}, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def load_demand_model(version=None):
+    """ The given (default: latest) stored model, or None if there is none. """
+    versions = model_versions()
+    if version is None:
+        if not versions:
+            return None
+        version = versions[-1]
+    payload = joblib.load(os.path.join(_model_dir(), f"demand-v{version:04d}.joblib"))
+    if payload.get("format") != MODEL_FORMAT:
+        return None
+    return payload["model"]
+
+
+def train_or_update(path=STATION_DATA_PATH, full=False):
+    """
+    Brings the stored model up to date with the station data. Trains from
+    scratch when forced or when no model exists, otherwise updates it with
+    new stations only. Returns (model, cells_used); nothing is saved when no
+    station was new.
+    """
+    stations = load_demand_stations(path)
+    model = None if full else load_demand_model()
+    if model is None:
+        model = DemandModel()
+        cells = model.fit(stations)
+    else:
+        cells = model.update(stations)
+        if cells == 0:
+            return model, 0
+    save_demand_model(model, station_data_version(path))
+    return model, cells
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["train", "update", "predict"])
+    parser.add_argument("--data", default=STATION_DATA_PATH)
+    parser.add_argument("--version", type=int, default=None, help="model version to predict with")
+    parser.add_argument("--city", default=None)
+    parser.add_argument("--cell-km", type=float, default=None)
+    parser.add_argument("--out", default=None, help="Parquet file for predicted grid")
+    args = parser.parse_args()
+
+    if args.command in ("train", "update"):
+        t0 = time.perf_counter()
+        model, cells = train_or_update(args.data, full=args.command == "train")
+        if cells == 0:
+            print(f"No new stations; model v{model.version} is current")
+        else:
+            print(f"Model v{model.version}: {cells} cells in {time.perf_counter() - t0:.1f} s")
+        return
+
+    model = load_demand_model(args.version)
+    if model is None:
+        parser.error("no trained model; run `train` first")
+    t0 = time.perf_counter()
+    grid = model.predict_grid(load_demand_stations(args.data), city=args.city, cell_km=args.cell_km)
+    print(f"Predicted {len(grid)} cells in {time.perf_counter() - t0:.2f} s")
+    if args.out:
+        grid.to_parquet(args.out, index=False)
+    else:
+        print(grid.sort_values('demand_kw', ascending=False).head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
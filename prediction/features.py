@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+from clustering.streaming import StreamingKMeans
+from preprocessing.station_store import STATION_DATA_PATH, load_stations
+from routing.geometry import haversine_km
+from spatial.station_index import EARTH_RADIUS_KM, parse_power_kw
+
+# Demand is predicted per grid cell of this size
+CELL_KM = 1.0
+# Cities' grids extend this far past their outermost station
+GRID_PAD_KM = 5.0
+# Stations farther than this from their city's median position (mislabelled
+# rows) do not stretch the city's grid
+CITY_RADIUS_KM = 60.0
+# Installed capacity within this radius of a cell centre is the demand target.
+# The dataset has no utilisation figures, so deployed kW stands in for demand.
+TARGET_RADIUS_KM = 1.0
+# Neighbour counts are taken in rings outside the target radius so the
+# features never see the stations the target is made of
+RING_RADII_KM = (2.0, 5.0, 15.0)
+N_CLUSTERS = 24
+
+FEATURE_COLUMNS = [
+    "log_ring_1_2km",       # stations 1-2 km away
+    "density_2_5km",        # stations per km² 2-5 km away
+    "density_5_15km",       # stations per km² 5-15 km away
+    "cluster_dist_km",      # distance to the nearest station-cluster centroid
+    "cluster_log_size",     # log1p(stations in that cluster)
+]
+
+
+def load_demand_stations(path=STATION_DATA_PATH):
+    """ Stations with coordinates, city, rated power (median-filled) and a `station_key`. """
+    df = load_stations(path, columns=['uid', 'latitude', 'longitude', 'city', 'capacity'])
+    df = df.dropna(subset=['latitude', 'longitude', 'city'])
+    # (0, 0) placeholders in the sheet are not real positions
+    df = df[(df['latitude'] != 0) | (df['longitude'] != 0)].reset_index(drop=True)
+    power = parse_power_kw(df['capacity'])
+    df = df.assign(power_kw=power.fillna(power.median()).fillna(0.0)).drop(columns='capacity')
+    return df.assign(station_key=station_keys(df))
+
+
+def station_keys(stations):
+    """ uid is not unique in the sheet, so a station is identified by uid and position. """
+    return pd.util.hash_pandas_object(
+        stations[['uid', 'latitude', 'longitude']].astype(str), index=False
+    ).to_numpy(dtype=np.uint64)
+
+
+def grid_cells(lat, lon, cell_km=CELL_KM, pad_km=GRID_PAD_KM):
+    """ Centres of a regular grid covering the padded bounding box of the points. """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    dlat = cell_km / 111.0
+    dlon = cell_km / (111.0 * max(np.cos(np.radians(np.abs(lat).max())), 1e-6))
+    pad_lat, pad_lon = pad_km / cell_km * dlat, pad_km / cell_km * dlon
+    lats = np.arange(lat.min() - pad_lat, lat.max() + pad_lat + dlat / 2, dlat)
+    lons = np.arange(lon.min() - pad_lon, lon.max() + pad_lon + dlon / 2, dlon)
+    grid_lat, grid_lon = np.meshgrid(lats, lons, indexing="ij")
+    return grid_lat.ravel(), grid_lon.ravel()
+
+
+def city_grids(stations, cell_km=CELL_KM, pad_km=GRID_PAD_KM, city_radius_km=CITY_RADIUS_KM):
+    """
+    One grid per city, concatenated, with `city`, `latitude`, `longitude`.
+    Each grid covers the city's stations within city_radius_km of its median position.
+    """
+    parts = []
+    for city, group in stations.groupby('city', observed=True):
+        lat = group['latitude'].to_numpy(dtype=np.float64)
+        lon = group['longitude'].to_numpy(dtype=np.float64)
+        core = haversine_km(lat, lon, np.median(lat), np.median(lon)) <= city_radius_km
+        lat, lon = grid_cells(lat[core], lon[core], cell_km, pad_km)
+        parts.append(pd.DataFrame({'city': city, 'latitude': lat, 'longitude': lon}))
+    if not parts:
+        return pd.DataFrame({'city': [], 'latitude': [], 'longitude': []})
+    return pd.concat(parts, ignore_index=True)
+
+
+class DemandFeatures:
+    """
+    Vectorized feature and target computation against one station snapshot.
+
+    Neighbour counts come from a haversine BallTree (one count_only query per
+    radius for all points at once); cluster membership from a MiniBatch
+    K-Means over all stations, passed in to keep features stable across
+    incremental updates.
+    """
+
+    def __init__(self, stations, clusters=None, n_clusters=N_CLUSTERS):
+        self.stations = stations.reset_index(drop=True)
+        coords = self.stations[['latitude', 'longitude']].to_numpy(dtype=np.float64)
+        self.tree = BallTree(np.radians(coords), metric='haversine')
+        self.power_kw = self.stations['power_kw'].to_numpy(dtype=np.float64)
+        if clusters is None:
+            clusters = StreamingKMeans(n_clusters=min(n_clusters, len(self.stations))).fit(self.stations)
+        self.clusters = clusters
+        centers = clusters.cluster_centers_latlon
+        self.cluster_tree = BallTree(np.radians(centers), metric='haversine')
+        labels = clusters.predict(self.stations)
+        self.cluster_sizes = np.bincount(labels, minlength=len(centers))
+
+    def transform(self, lat, lon):
+        """ Feature matrix (n, len(FEATURE_COLUMNS)) for arrays of points. """
+        X = np.radians(np.column_stack([lat, lon]).astype(np.float64))
+        inner, r2, r5, r15 = (
+            self.tree.query_radius(X, r / EARTH_RADIUS_KM, count_only=True)
+            for r in (TARGET_RADIUS_KM,) + RING_RADII_KM
+        )
+        a, b, c = RING_RADII_KM
+        dist, idx = self.cluster_tree.query(X, k=1)
+        return np.column_stack([
+            np.log1p(r2 - inner),
+            (r5 - r2) / (np.pi * (b ** 2 - a ** 2)),
+            (r15 - r5) / (np.pi * (c ** 2 - b ** 2)),
+            dist[:, 0] * EARTH_RADIUS_KM,
+            np.log1p(self.cluster_sizes[idx[:, 0]]),
+        ])
+
+    def target(self, lat, lon):
+        """ Installed kW within TARGET_RADIUS_KM of each point. """
+        X = np.radians(np.column_stack([lat, lon]).astype(np.float64))
+        neighbours = self.tree.query_radius(X, TARGET_RADIUS_KM / EARTH_RADIUS_KM)
+        counts = np.fromiter((len(n) for n in neighbours), dtype=np.intp, count=len(neighbours))
+        if counts.sum() == 0:
+            return np.zeros(len(neighbours))
+        owner = np.repeat(np.arange(len(neighbours)), counts)
+        return np.bincount(owner, weights=self.power_kw[np.concatenate(neighbours)], minlength=len(neighbours))
@@ -1,12 +1,22 @@
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
+from lazy_utils import lazy_import
+from preprocessing.station_store import load_stations
+
+sklearn_preprocessing = lazy_import("sklearn.preprocessing")
 
 def load_and_clean_data(path):
-    df = pd.read_excel(path, sheet_name='ev_locations')
-    df = df[['latitude', 'longitude', 'name', 'city']].dropna()
+    # Served from the cached columnar copy of the sheet; only the needed columns are read
+    df = load_stations(path, columns=['latitude', 'longitude', 'name', 'city'])
+    df = df.dropna()
     return df
 
 def scale_coordinates(df):
-    scaler = StandardScaler()
+    scaler = sklearn_preprocessing.StandardScaler()
     scaled = scaler.fit_transform(df[['latitude', 'longitude']])
     return scaled, scaler
+
+def fit_scaler_streaming(chunks):
+    # Same scaling as scale_coordinates, accumulated chunk by chunk for out-of-core data
+    scaler = sklearn_preprocessing.StandardScaler()
+    for chunk in chunks:
+        scaler.partial_fit(chunk[['latitude', 'longitude']])
+    return scaler
@@ -0,0 +1,219 @@
+"""
+Incremental station ingestion into versioned, immutable snapshots.
+
+Run from the repo root:
+    python -m preprocessing.station_ingest feeds/stations_2024_06.csv
+
+A new feed (xlsx, CSV, GeoJSON or Parquet) is diffed row by row against the
+current snapshot by station key. If anything changed, the feed is written
+as a new Parquet snapshot (never modified afterwards) together with a change
+set listing the added, removed and modified stations and the cities they
+belong to. Downstream caches are then brought forward city by city: cluster
+sweeps of unchanged cities are carried over to the new version, and only
+the changed cities are refitted.
+
+Point the app at the latest snapshot with EVISION_STATION_DATA=<snapshot>.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from preprocessing.station_store import (STATION_DATA_PATH, STATION_SHEET, file_sha256, load_stations,
+                                         read_station_feed, station_data_version)
+
+SNAPSHOT_DIR = os.environ.get("EVISION_SNAPSHOT_DIR", "data/snapshots")
+# Bump when the change set layout changes
+CHANGESET_FORMAT = 1
+# Fields that identify one of several rows sharing a uid (a connector, not its details)
+IDENTITY_COLUMNS = ("latitude", "longitude", "type", "power_type", "capacity")
+# Decimals kept when comparing floats; text feeds do not round-trip the last digits (7 is ~1 cm)
+FLOAT_DECIMALS = 7
+
+
+def station_keys(df):
+    """
+    Stable key per row: the feed's uid plus an occurrence number. A uid can
+    cover several rows (one per connector), which are numbered in order of
+    their IDENTITY_COLUMNS, so neither reordering the feed nor editing a
+    row's details changes any key.
+    """
+    uid = df['uid'].astype("string").fillna("")
+    # Rows without a uid fall back to their coordinates
+    uid = uid.mask(uid == "", "@" + df['latitude'].astype("string") + "," + df['longitude'].astype("string"))
+    digest = row_hashes(df, [c for c in IDENTITY_COLUMNS if c in df.columns])
+    order = pd.DataFrame({'uid': uid.to_numpy(), 'digest': digest}).sort_values(['uid', 'digest'], kind="stable")
+    occurrence = order.groupby('uid', sort=False).cumcount().reindex(range(len(df))).to_numpy()
+    return uid.to_numpy(dtype=object) + "#" + occurrence.astype(str)
+
+
+def row_hashes(df, columns=None):
+    """ Content hash per row, independent of column order and of how the feed typed the values. """
+    df = df[sorted(columns if columns is not None else df.columns)]
+    floats = df.select_dtypes("float").columns
+    df = df.assign(**{c: df[c].round(FLOAT_DECIMALS) for c in floats})
+    as_text = df.astype("string").fillna("\x00")
+    return pd.util.hash_pandas_object(as_text, index=False).to_numpy()
+
+
+def diff_stations(old, new):
+    """
+    Change set between two station tables:
+    {"added", "removed", "modified": [keys], "cities": [cities touched]}.
+    A modified station counts for both its old and its new city.
+    """
+    old = old.assign(_key=station_keys(old), _hash=row_hashes(old)).set_index('_key') if len(old) else None
+    new = new.assign(_key=station_keys(new), _hash=row_hashes(new)).set_index('_key')
+    if old is None:
+        return {"added": sorted(new.index), "removed": [], "modified": [],
+                "cities": sorted(new['city'].dropna().astype(str).unique())}
+
+    added = new.index.difference(old.index)
+    removed = old.index.difference(new.index)
+    common = new.index.intersection(old.index)
+    modified = common[new.loc[common, '_hash'].to_numpy() != old.loc[common, '_hash'].to_numpy()]
+    cities = pd.concat([new.loc[added.union(modified), 'city'].astype(str),
+                        old.loc[removed.union(modified), 'city'].astype(str)])
+    return {"added": sorted(added), "removed": sorted(removed), "modified": sorted(modified),
+            "cities": sorted(cities.dropna().unique())}
+
+
+def _manifest_path(snapshot_dir):
+    return os.path.join(snapshot_dir, "manifest.json")
+
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    """ Snapshot entries, oldest first (empty before the first ingestion). """
+    try:
+        with open(_manifest_path(snapshot_dir)) as f:
+            return json.load(f)["snapshots"]
+    except FileNotFoundError:
+        return []
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def current_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """ Path of the latest snapshot, or None if nothing has been ingested yet. """
+    snapshots = read_manifest(snapshot_dir)
+    return os.path.join(snapshot_dir, snapshots[-1]["file"]) if snapshots else None
+
+
+def write_snapshot(df, snapshot_dir=SNAPSHOT_DIR):
+    """ Writes df as an immutable snapshot named by its content hash; returns (path, version). """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tmp = os.path.join(snapshot_dir, f".{os.getpid()}.tmp.parquet")
+    df.to_parquet(tmp, index=False)
+    version = file_sha256(tmp)
+    path = os.path.join(snapshot_dir, f"{version[:16]}.parquet")
+    if os.path.exists(path):
+        os.remove(tmp)
+    else:
+        os.replace(tmp, path)
+        os.chmod(path, 0o444)
+    return path, version
+
+
+def ingest(feed, base=None, snapshot_dir=SNAPSHOT_DIR, sheet_name=STATION_SHEET):
+    """
+    Diffs `feed` against `base` (default: the current snapshot, or the
+    app's STATION_DATA_PATH before the first ingestion) and, if anything
+    changed, stores it as a new snapshot. Returns the change set, with
+    "from"/"to" dataset versions and the snapshot path; "to" is None when
+    the feed brings no changes.
+    """
+    base = base or current_snapshot(snapshot_dir) or STATION_DATA_PATH
+    old = load_stations(base) if os.path.exists(base) else pd.DataFrame()
+    new = read_station_feed(feed, sheet_name)
+    missing = {"uid", "latitude", "longitude", "city"} - set(new.columns)
+    if missing:
+        raise ValueError(f"Station feed is missing columns: {', '.join(sorted(missing))}")
+
+    # Canonical row order and float precision, so a reordered or re-exported feed
+    # leaves the cities' fingerprints unchanged
+    new = new.iloc[np.argsort(station_keys(new), kind="stable")].reset_index(drop=True)
+    new = new.round(FLOAT_DECIMALS)
+    snapshots = read_manifest(snapshot_dir)
+    changes = diff_stations(old, new)
+    changes.update(format=CHANGESET_FORMAT, feed=os.path.abspath(feed), base=base, created_at=time.time(),
+                   stations=len(new), to=None, snapshot=None,
+                   **{"from": station_data_version(base) if len(old) else None})
+    # The first ingestion always stores a snapshot, even of an unchanged dataset
+    if snapshots and not (changes["added"] or changes["removed"] or changes["modified"]):
+        return changes
+
+    path, version = write_snapshot(new, snapshot_dir)
+    changes.update(to=version, snapshot=path)
+    _write_json(os.path.join(snapshot_dir, f"{version[:16]}.changes.json"), changes)
+    snapshots = [s for s in snapshots if s["version"] != version]
+    snapshots.append({"version": version, "file": os.path.basename(path), "parent": changes["from"],
+                      "created_at": changes["created_at"], "stations": len(new),
+                      "changed_cities": changes["cities"]})
+    _write_json(_manifest_path(snapshot_dir), {"snapshots": snapshots})
+    return changes
+
+
+def refresh_caches(changes, workers=None):
+    """
+    Brings the derived caches forward to the new snapshot: carries over
+    unchanged cities' sweeps, refits the hot-city report (only the changed
+    cities are recomputed) and prebuilds the density tiles.
+    Returns {"sweeps_carried", "report_recomputed"}.
+    """
+    # Imported here: the derived caches depend on this package, not the other way round
+    from clustering.city_report import hot_cities, update_report
+    from clustering.kmeans_service import carry_over_sweeps
+    from spatial.density_tiles import get_density_tiles
+
+    if not changes["to"]:
+        return {"sweeps_carried": 0, "report_recomputed": []}
+    carried = 0
+    if changes["from"]:
+        # Same row filtering as the Infra page, so the fingerprints match what it passes in
+        stations = load_stations(changes["snapshot"], columns=['latitude', 'longitude', 'city', 'name'])
+        carried = carry_over_sweeps(changes["from"], changes["to"], hot_cities(stations, min_stations=1))
+    report = update_report(changes["snapshot"], workers=workers)
+    # Tiles aggregate across cities; a full rebuild takes milliseconds
+    get_density_tiles(changes["snapshot"])
+    return {"sweeps_carried": carried, "report_recomputed": report["recomputed"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("feed", help="xlsx, CSV, GeoJSON or Parquet station feed")
+    parser.add_argument("--base", default=None, help="dataset to diff against (default: the current snapshot)")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--sheet", default=STATION_SHEET, help="sheet name for xlsx feeds")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for refitting cities")
+    parser.add_argument("--no-refresh", action="store_true", help="only write the snapshot and change set")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    changes = ingest(args.feed, args.base, args.snapshot_dir, args.sheet)
+    print(f"{len(changes['added'])} added, {len(changes['removed'])} removed, "
+          f"{len(changes['modified'])} modified in {len(changes['cities'])} cities "
+          f"({time.perf_counter() - t0:.1f} s)")
+    if not changes["to"]:
+        print("No changes; the current snapshot stays in place.")
+        return 0
+    print(f"Snapshot {changes['snapshot']}")
+    if not args.no_refresh:
+        refreshed = refresh_caches(changes, args.workers)
+        print(f"{refreshed['sweeps_carried']} city sweeps carried over, "
+              f"{len(refreshed['report_recomputed'])} hot cities refitted "
+              f"in {time.perf_counter() - t0:.1f} s total")
+    print(f"Use it with EVISION_STATION_DATA={changes['snapshot']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from cache_utils import get_cache_dir
+
+# Any feed read_station_feed() understands, e.g. a snapshot written by preprocessing.station_ingest
+STATION_DATA_PATH = os.environ.get("EVISION_STATION_DATA", "data/ev_stations.xlsx")
+STATION_SHEET = "ev_locations"
+CATEGORICAL_COLUMNS = ("city",)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _store_paths(source):
+    # Named by the file and its absolute path, so same-named feeds in different places stay apart
+    path_hash = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:12]
+    stem = f"{os.path.splitext(os.path.basename(source))[0]}-{path_hash}"
+    cache_dir = get_cache_dir("stations")
+    return os.path.join(cache_dir, f"{stem}.parquet"), os.path.join(cache_dir, f"{stem}.meta.json")
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+
+def _read_geojson(source):
+    with open(source) as f:
+        features = json.load(f).get("features", [])
+    rows = []
+    for feature in features:
+        row = dict(feature.get("properties") or {})
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Point":
+            row.setdefault("longitude", geometry["coordinates"][0])
+            row.setdefault("latitude", geometry["coordinates"][1])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def normalize_stations(df):
+    """ String column names, pandas string dtype for text and categorical city, as stored. """
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype("string")
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def read_station_feed(source, sheet_name=STATION_SHEET):
+    """ A station feed (xlsx, CSV, GeoJSON or Parquet) as a normalized DataFrame. """
+    ext = os.path.splitext(source)[1].lower()
+    if ext in (".xlsx", ".xls"):
+        df = pd.read_excel(source, sheet_name=sheet_name)
+    elif ext == ".csv":
+        df = pd.read_csv(source)
+    elif ext in (".geojson", ".json"):
+        df = _read_geojson(source)
+    elif ext == ".parquet":
+        df = pd.read_parquet(source)
+    else:
+        raise ValueError(f"Unsupported station feed format: {source}")
+    return normalize_stations(df)
+
+
+def _convert(source, parquet_path, sheet_name):
+    df = read_station_feed(source, sheet_name)
+    tmp = f"{parquet_path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, parquet_path)
+
+
+def ensure_station_store(source=STATION_DATA_PATH, sheet_name=STATION_SHEET):
+    """
+    Converts the station sheet to Parquet once and returns (parquet_path, meta).
+
+    The store is rebuilt only when the source changes: a matching mtime/size
+    skips all work, and if only the mtime moved the content hash decides.
+    `meta["sha256"]` identifies the dataset version for downstream caches.
+    """
+    parquet_path, meta_path = _store_paths(source)
+    if source.endswith(".parquet"):
+        # Already columnar (e.g. an ingested snapshot): read in place, only the hash is stored
+        parquet_path = source
+    st = os.stat(source)
+    meta = _read_meta(meta_path)
+    if meta is not None and os.path.exists(parquet_path) and meta.get("sheet") == sheet_name:
+        if meta["mtime"] == st.st_mtime and meta["size"] == st.st_size:
+            return parquet_path, meta
+        sha = file_sha256(source)
+        if sha == meta["sha256"]:
+            meta.update(mtime=st.st_mtime, size=st.st_size)
+            _write_meta(meta_path, meta)
+            return parquet_path, meta
+    else:
+        sha = file_sha256(source)
+
+    if parquet_path != source:
+        _convert(source, parquet_path, sheet_name)
+    meta = {"source": os.path.abspath(source), "sheet": sheet_name,
+            "mtime": st.st_mtime, "size": st.st_size, "sha256": sha}
+    _write_meta(meta_path, meta)
+    return parquet_path, meta
+
+
+def load_stations(source=STATION_DATA_PATH, columns=None, sheet_name=STATION_SHEET):
+    """ Station table from the columnar store, reading only `columns` when given. """
+    parquet_path, _ = ensure_station_store(source, sheet_name)
+    return pd.read_parquet(parquet_path, columns=list(columns) if columns is not None else None)
+
+
+def station_data_version(source=STATION_DATA_PATH, sheet_name=STATION_SHEET):
+    """ Content hash of the current station dataset. """
+    return ensure_station_store(source, sheet_name)[1]["sha256"]
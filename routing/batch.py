@@ -0,0 +1,228 @@
+"""
+Plan a file of trips headlessly across a process pool.
+
+Run from the repo root:  python -m routing.batch trips.csv plans.parquet --workers 4
+
+The input (CSV, JSONL or Parquet) needs start_city and end_city columns;
+battery_capacity, ev_range_km, avg_speed, charger_power and id are optional.
+Results stream to Parquet or JSONL (chosen by the output extension) in
+completion order. Workers share the on-disk geocode, route and places caches.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from routing import lookups, providers
+from routing.trip_planner import CHARGER_POWER_KW, InvalidCityError, plan_trip
+
+# Defaults for missing vehicle columns (the trip planner's slider defaults)
+VEHICLE_DEFAULTS = {"battery_capacity": 60, "ev_range_km": 250, "avg_speed": 70, "charger_power": CHARGER_POWER_KW}
+# Trips queued per worker; keeps memory flat however large the input is
+QUEUE_PER_WORKER = 4
+PARQUET_BATCH_ROWS = 512
+
+RESULT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("start_city", pa.string()),
+    ("end_city", pa.string()),
+    ("status", pa.string()),
+    ("error", pa.string()),
+    ("total_dist_km", pa.float64()),
+    ("driving_time_hr", pa.float64()),
+    ("charging_time_hr", pa.float64()),
+    ("total_trip_time_hr", pa.float64()),
+    ("num_charging_stops", pa.int32()),
+    ("stop_method", pa.string()),
+    ("stops", pa.string()),
+    ("elapsed_s", pa.float64()),
+])
+
+
+def read_trips(path):
+    """ Trip rows as dicts, with vehicle defaults filled in and an id per row. """
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    elif path.endswith((".jsonl", ".json")):
+        df = pd.read_json(path, lines=True)
+    else:
+        df = pd.read_csv(path)
+    missing = {"start_city", "end_city"} - set(df.columns)
+    if missing:
+        raise ValueError(f"Trip file is missing columns: {', '.join(sorted(missing))}")
+    for col, default in VEHICLE_DEFAULTS.items():
+        df[col] = df[col].fillna(default) if col in df.columns else default
+    if "id" not in df.columns:
+        df["id"] = range(len(df))
+    df["id"] = df["id"].astype(str)
+    return df.to_dict("records")
+
+
+def plan_record(trip, with_details=False):
+    """ Plan one trip row into a flat result record; failures become status rows. """
+    t0 = time.perf_counter()
+    record = {name: None for name in RESULT_SCHEMA.names}
+    record.update(id=trip["id"], start_city=trip["start_city"], end_city=trip["end_city"])
+    try:
+        plan = plan_trip(trip["start_city"], trip["end_city"], float(trip["battery_capacity"]),
+                         float(trip["ev_range_km"]), float(trip["avg_speed"]), float(trip["charger_power"]),
+                         with_details=with_details)
+    except InvalidCityError as e:
+        record.update(status="invalid_city", error=str(e))
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    else:
+        stops = [
+            {"distance_km": round(s["distance_km"], 3), "lat": s["lat"], "lon": s["lon"],
+             "name": s["name"], "chargers": len(s["chargers"])}
+            for s in plan["stops"]
+        ]
+        record.update(
+            status="ok",
+            total_dist_km=plan["total_dist_km"],
+            driving_time_hr=plan["driving_time_hr"],
+            charging_time_hr=plan["charging_time_hr"],
+            total_trip_time_hr=plan["total_trip_time_hr"],
+            num_charging_stops=plan["num_charging_stops"],
+            stop_method=plan["stop_method"],
+            stops=json.dumps(stops, separators=(",", ":")),
+        )
+    record["elapsed_s"] = time.perf_counter() - t0
+    return record
+
+
+class _JsonlWriter:
+    def __init__(self, path):
+        self._f = open(path, "w", encoding="utf-8")
+
+    def write(self, record):
+        self._f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def close(self):
+        self._f.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path, batch_rows=PARQUET_BATCH_ROWS):
+        self._writer = pq.ParquetWriter(path, RESULT_SCHEMA)
+        self._batch_rows = batch_rows
+        self._pending = []
+
+    def write(self, record):
+        self._pending.append(record)
+        if len(self._pending) >= self._batch_rows:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._writer.write_table(pa.Table.from_pylist(self._pending, schema=RESULT_SCHEMA))
+            self._pending = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_result_writer(path):
+    return _ParquetWriter(path) if path.endswith(".parquet") else _JsonlWriter(path)
+
+
+def _init_worker(provider_urls, charger_source, router, road_graph, mapmyindia_rate, workers, started):
+    # Spawned workers do not see configure_providers() calls made in the parent
+    providers.configure_providers(**provider_urls)
+    providers.CHARGER_SOURCE = charger_source
+    providers.ROUTER, providers.ROAD_GRAPH = router, road_graph
+    # Each worker gets its share of the MapmyIndia quota, so the pool as a whole stays within it.
+    # The n-th worker to start makes its first request n / mapmyindia_rate s in, so the workers
+    # take turns from the start instead of all sending their first request at once.
+    with started.get_lock():
+        n, started.value = started.value, started.value + 1
+    lookups.set_mapmyindia_rate(mapmyindia_rate / workers, start_delay_s=(n % workers) / mapmyindia_rate)
+
+
+def plan_batch(trips, out_path, workers=None, with_details=False, progress=None):
+    """
+    Plan `trips` (a list of dicts as returned by read_trips) on a process
+    pool and stream each result record to out_path as it completes.
+
+    `progress(done, total, elapsed_s)` is called after every result.
+    Returns {"trips", "ok", "failed", "elapsed_s", "trips_per_s"}.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = len(trips)
+    stats = {"trips": total, "ok": 0, "failed": 0}
+    writer = open_result_writer(out_path)
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(dict(providers.PROVIDER_URLS), providers.CHARGER_SOURCE,
+                                           providers.ROUTER, providers.ROAD_GRAPH,
+                                           lookups.MAPMYINDIA_LIMITER.rate, workers,
+                                           multiprocessing.Value("i", 0))) as pool:
+            pending = set()
+            queued = iter(trips)
+            done = 0
+            while True:
+                for trip in queued:
+                    pending.add(pool.submit(plan_record, trip, with_details))
+                    if len(pending) >= workers * QUEUE_PER_WORKER:
+                        break
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    record = fut.result()
+                    writer.write(record)
+                    stats["ok" if record["status"] == "ok" else "failed"] += 1
+                    done += 1
+                    if progress:
+                        progress(done, total, time.perf_counter() - t0)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - t0
+    stats["elapsed_s"] = elapsed
+    stats["trips_per_s"] = total / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("trips", help="CSV, JSONL or Parquet file of trips")
+    parser.add_argument("output", help="results file (.parquet or .jsonl)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--details", action="store_true", help="look up chargers and POIs around every stop")
+    parser.add_argument("--offline-chargers", action="store_true", help="use the local station index instead of MapmyIndia")
+    parser.add_argument("--local-graph", default=None, help="route on this local road graph instead of OpenRouteService")
+    for name in providers.PROVIDER_URLS:
+        parser.add_argument(f"--{name.replace('_', '-')}-url", dest=f"{name}_url", default=None,
+                            help=f"base URL for {name} (e.g. a local stub server)")
+    args = parser.parse_args(argv)
+
+    providers.configure_providers(**{name: getattr(args, f"{name}_url") for name in providers.PROVIDER_URLS})
+    if args.offline_chargers:
+        providers.CHARGER_SOURCE = "offline"
+    if args.local_graph:
+        providers.ROUTER, providers.ROAD_GRAPH = "local", args.local_graph
+
+    trips = read_trips(args.trips)
+    step = max(1, len(trips) // 20)
+
+    def report(done, total, elapsed):
+        if done % step == 0 or done == total:
+            print(f"{done}/{total} trips  {done / elapsed:.1f} trips/s", file=sys.stderr)
+
+    stats = plan_batch(trips, args.output, workers=args.workers, with_details=args.details, progress=report)
+    print(f"Planned {stats['trips']} trips ({stats['ok']} ok, {stats['failed']} failed) "
+          f"in {stats['elapsed_s']:.1f} s: {stats['trips_per_s']:.1f} trips/s")
+
+
+if __name__ == "__main__":
+    main()
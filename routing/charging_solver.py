@@ -0,0 +1,180 @@
+import numpy as np
+
+SOC_STEP = 0.02
+RESERVE_SOC = 0.2          # same margin as safe_limit_km = 0.8 * ev_range_km
+TAPER_SOC = 0.8            # above this, chargers deliver a fraction of their power
+TAPER_FACTOR = 0.5
+STOP_OVERHEAD_H = 5 / 60   # parking, plugging in, paying
+
+
+def charge_time_h(soc_from, soc_to, power_kw, battery_kwh, taper_soc=TAPER_SOC, taper_factor=TAPER_FACTOR):
+    """
+    Hours to charge from soc_from to soc_to (fractions, broadcastable arrays):
+    full power up to taper_soc, taper_factor * power above it.
+    """
+    soc_from = np.asarray(soc_from, dtype=np.float64)
+    soc_to = np.maximum(np.asarray(soc_to, dtype=np.float64), soc_from)
+    bulk = np.minimum(soc_to, taper_soc) - np.minimum(soc_from, taper_soc)
+    topup = np.maximum(soc_to, taper_soc) - np.maximum(soc_from, taper_soc)
+    return battery_kwh * (bulk + topup / taper_factor) / power_kw
+
+
+def _dominated(times):
+    """ Level l is dominated when some higher level is reachable no later. """
+    best_above = np.minimum.accumulate(times[::-1])[::-1]
+    out = np.zeros(len(times), dtype=bool)
+    out[:-1] = best_above[1:] <= times[:-1]
+    return out
+
+
+def _undominated_candidates(positions_km, powers_kw, detour_km, idx):
+    """
+    Candidate indices sorted by position, dropping chargers that share a route
+    position with one at least as powerful and no farther off the route
+    (e.g. several sockets at one site). Lossless for the optimum.
+    """
+    idx = idx[np.lexsort((detour_km[idx], -powers_kw[idx], positions_km[idx]))]
+    keep = []
+    last_pos, best_detour = None, np.inf
+    for i in idx:
+        if positions_km[i] != last_pos:
+            last_pos, best_detour = positions_km[i], np.inf
+        if detour_km[i] < best_detour:
+            keep.append(i)
+            best_detour = detour_km[i]
+    return np.asarray(keep, dtype=np.intp)
+
+
+def solve_charging_plan(positions_km, powers_kw, total_km, battery_kwh, ev_range_km, avg_speed_kmh,
+                        detour_km=None, start_soc=1.0, reserve_soc=RESERVE_SOC, soc_step=SOC_STEP,
+                        stop_overhead_h=STOP_OVERHEAD_H, max_power_kw=None):
+    """
+    Minimum-time charging stops along a route.
+
+    Label-setting search over (charger, SoC level) states. Nodes are the start,
+    the candidate chargers sorted by position, and the destination; each node
+    pulls arrival labels from every predecessor within range in one array
+    operation. Arrival states dominated by a higher-SoC, no-slower state at the
+    same node are discarded before departures are expanded. Arrival SoC is
+    floored to the grid, so returned plans are always feasible.
+
+    positions_km: distance along the route of each candidate
+    powers_kw:    charger power per candidate (capped at max_power_kw)
+    detour_km:    off-route distance per candidate, driven both ways when used
+
+    Returns a dict with "feasible", "stops" (one dict per stop in route order),
+    "total_time_h", "driving_time_h", "charging_time_h".
+    """
+    positions_km = np.asarray(positions_km, dtype=np.float64)
+    powers_kw = np.asarray(powers_kw, dtype=np.float64)
+    detour_km = np.zeros_like(positions_km) if detour_km is None else np.asarray(detour_km, dtype=np.float64)
+    if max_power_kw is not None:
+        powers_kw = np.minimum(powers_kw, max_power_kw)
+
+    ok = (positions_km > 0) & (positions_km < total_km) & (powers_kw > 0)
+    order = _undominated_candidates(positions_km, powers_kw, detour_km, np.flatnonzero(ok))
+    pos = np.concatenate([[0.0], positions_km[order], [total_km]])
+    det = np.concatenate([[0.0], detour_km[order], [0.0]])
+    power = np.concatenate([[np.nan], powers_kw[order], [np.nan]])
+    n = len(pos)
+
+    levels = np.round(np.arange(0.0, 1.0 + 1e-9, soc_step), 10)
+    n_levels = len(levels)
+    reserve_level = int(np.ceil(reserve_soc / soc_step - 1e-9))
+    max_leg_km = (1.0 - reserve_soc) * ev_range_km
+
+    # Arrival time per (node, level) with back-pointers to the departure label used
+    arr_t = np.full((n, n_levels), np.inf)
+    arr_src = np.full((n, n_levels), -1, dtype=np.intp)
+    # Non-dominated departure labels, appended node by node, so the labels of
+    # nodes lo..k-1 are always one contiguous slice of the pool
+    pool_node = np.empty(n * n_levels, dtype=np.intp)
+    pool_level = np.empty(n * n_levels, dtype=np.intp)
+    pool_t = np.empty(n * n_levels)
+    pool_from = np.empty(n * n_levels, dtype=np.intp)   # arrival level charged from
+    pool_start = np.zeros(n + 1, dtype=np.intp)
+
+    start_level = int(np.floor(start_soc / soc_step + 1e-9))
+    pool_node[0], pool_level[0], pool_t[0], pool_from[0] = 0, start_level, 0.0, start_level
+    pool_start[1] = 1
+    upper = np.triu(np.ones((n_levels, n_levels), dtype=bool), k=1)
+    level_idx = np.arange(n_levels)
+    charge_tables = {}
+
+    for k in range(1, n):
+        lo = int(np.searchsorted(pos, pos[k] - max_leg_km, side="left"))
+        labels = slice(pool_start[lo], pool_start[k])
+        src_node = pool_node[labels]
+        leg_km = pos[k] - pos[src_node] + det[src_node] + det[k]
+        arrive_level = np.floor((levels[pool_level[labels]] - leg_km / ev_range_km) / soc_step + 1e-9).astype(np.intp)
+        valid = np.flatnonzero(arrive_level >= reserve_level)
+        if len(valid):
+            t = pool_t[labels][valid] + leg_km[valid] / avg_speed_kmh
+            level_of = arrive_level[valid]
+            # Fastest label per arrival level; on ties any of the fastest will do
+            np.minimum.at(arr_t[k], level_of, t)
+            fastest = t == arr_t[k, level_of]
+            arr_src[k, level_of[fastest]] = labels.start + valid[fastest]
+
+        pool_start[k + 1] = pool_start[k]
+        if k == n - 1 or not len(valid):
+            continue
+        # Prune arrival states dominated by a higher-SoC state that is no slower
+        arrivals = np.flatnonzero(np.isfinite(arr_t[k]) & ~_dominated(arr_t[k]))
+
+        # Charge from every surviving arrival level to every higher level
+        if power[k] not in charge_tables:
+            table = charge_time_h(levels[:, None], levels[None, :], power[k], battery_kwh)
+            charge_tables[power[k]] = np.where(upper, table + stop_overhead_h, np.inf)
+        cost = arr_t[k, arrivals][:, None] + charge_tables[power[k]][arrivals]
+        src = np.argmin(cost, axis=0)
+        dep_t = cost[src, level_idx]
+        # Departures with less charge and no time saved are never worth propagating
+        keep = np.flatnonzero(np.isfinite(dep_t) & ~_dominated(dep_t))
+        end = pool_start[k] + len(keep)
+        pool_node[pool_start[k]:end] = k
+        pool_level[pool_start[k]:end] = keep
+        pool_t[pool_start[k]:end] = dep_t[keep]
+        pool_from[pool_start[k]:end] = arrivals[src[keep]]
+        pool_start[k + 1] = end
+
+    dest = n - 1
+    final = arr_t[dest]
+    if not np.isfinite(final).any():
+        return {"feasible": False, "stops": [], "total_time_h": float("inf"),
+                "driving_time_h": float("inf"), "charging_time_h": float("inf")}
+
+    # Walk the back-pointers from the fastest arrival at the destination
+    level = int(np.argmin(final))
+    total_time = float(final[level])
+    stops = []
+    node = dest
+    while node != 0:
+        label = arr_src[node, level]
+        prev, dep_level = pool_node[label], pool_level[label]
+        if prev != 0:
+            arrive_level = pool_from[label]
+            stops.append({
+                "candidate": int(order[prev - 1]),
+                "position_km": float(pos[prev]),
+                "arrive_soc": float(levels[arrive_level]),
+                "depart_soc": float(levels[dep_level]),
+                "charge_h": float(charge_time_h(levels[arrive_level], levels[dep_level], power[prev], battery_kwh)),
+            })
+            level = arrive_level
+        node = prev
+    stops.reverse()
+
+    charging_time = sum(s["charge_h"] for s in stops) + stop_overhead_h * len(stops)
+    return {"feasible": True, "stops": stops, "total_time_h": total_time,
+            "driving_time_h": total_time - charging_time, "charging_time_h": charging_time}
+
+
+def heuristic_trip_time_h(total_km, battery_kwh, ev_range_km, avg_speed_kmh, charger_power_kw=50):
+    """
+    The planner's original estimate: a stop every 0.8 * range, each charging
+    0.8 * battery at a flat charger_power_kw.
+    """
+    safe_limit_km = int(ev_range_km * 0.8)
+    n_stops = int(total_km // safe_limit_km) if safe_limit_km > 0 else 0
+    return total_km / avg_speed_kmh + n_stops * (0.8 * battery_kwh / charger_power_kw)
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from cache_utils import get_cache_dir
+
+POSITIVE_TTL_S = 30 * 24 * 3600  # city coordinates practically never change
+NEGATIVE_TTL_S = 24 * 3600       # unknown names are retried after a day
+
+
+def normalize_query(query):
+    """ 'Nagpur', ' nagpur ' and 'NAGPUR' all map to the same cache key. """
+    return " ".join(str(query).split()).casefold()
+
+
+class GeocodeCache:
+    """
+    Two-tier geocoding cache: an in-process LRU in front of a SQLite file.
+
+    Values are (lat, lon) tuples; (None, None) is stored as a negative entry
+    for names the geocoder did not know. Entries expire after their TTL.
+    """
+
+    def __init__(self, path=None, maxsize=1024, ttl=POSITIVE_TTL_S, negative_ttl=NEGATIVE_TTL_S):
+        self.path = path or os.path.join(get_cache_dir("geocode"), "geocode.sqlite")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            "query TEXT PRIMARY KEY, lat REAL, lon REAL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, query):
+        """ Returns (found, value). `found` is False on a miss or an expired entry. """
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return True, entry[0]
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT lat, lon, expires_at FROM geocode WHERE query = ?", (key,)
+            ).fetchone()
+            if row is not None and row[2] > now:
+                value = (row[0], row[1])
+                self._remember(key, value, row[2])
+                self.stats["disk_hits"] += 1
+                return True, value
+
+            self.stats["misses"] += 1
+            return False, None
+
+    def set(self, query, value):
+        key = normalize_query(query)
+        lat, lon = value if value is not None else (None, None)
+        ttl = self.ttl if lat is not None else self.negative_ttl
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode (query, lat, lon, expires_at) VALUES (?, ?, ?, ?)",
+                (key, lat, lon, expires_at),
+            )
+            self._conn.commit()
+            self._remember(key, (lat, lon), expires_at)
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM geocode WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM geocode")
+            self._conn.commit()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_geocode_cache():
+    """ Process-wide cache instance, shared by all Streamlit sessions. """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = GeocodeCache()
+        return _default_cache
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts in seconds per API host
+HOST_TIMEOUTS = {
+    "nominatim.openstreetmap.org": (3.05, 10),
+    "api.openrouteservice.org": (3.05, 30),
+    "outpost.mapmyindia.com": (3.05, 10),
+    "atlas.mapmyindia.com": (3.05, 10),
+}
+DEFAULT_TIMEOUT = (3.05, 15)
+
+# Assumed token lifetime when the provider omits expires_in (or sends 0)
+DEFAULT_TOKEN_LIFETIME_S = 600
+# Keep a few connections alive per host; sized for the stop lookup thread pool
+POOL_MAXSIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=len(HOST_TIMEOUTS), pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": "Mozilla/5.0"})
+    return session
+
+
+def get_session():
+    """ Process-wide keep-alive session, so repeated calls reuse TCP+TLS connections. """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def timeout_for(url):
+    return HOST_TIMEOUTS.get(urlsplit(url).hostname, DEFAULT_TIMEOUT)
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault("timeout", timeout_for(url))
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+async def request_async(method, url, **kwargs):
+    """ Same pooled request for asyncio callers; runs in the default executor. """
+    return await asyncio.to_thread(request, method, url, **kwargs)
+
+
+class TokenCache:
+    """
+    Caches an OAuth access token and refreshes it `refresh_margin` seconds
+    (at most half its lifetime) before it expires.
+    `fetch` must return (access_token, expires_in_seconds); a missing or zero
+    expires_in means default_lifetime. A missing token is not cached.
+    """
+
+    def __init__(self, fetch, refresh_margin=60, default_lifetime=DEFAULT_TOKEN_LIFETIME_S):
+        self._fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.default_lifetime = default_lifetime
+        self._token = None
+        self._refresh_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._token is None or time.monotonic() >= self._refresh_at:
+                token, expires_in = self._fetch()
+                lifetime = float(expires_in or 0) or float(self.default_lifetime)
+                self._token = token
+                if token is None:
+                    # A failed fetch is retried on the next call
+                    self._refresh_at = 0.0
+                else:
+                    self._refresh_at = time.monotonic() + lifetime - min(self.refresh_margin, lifetime / 2)
+            return self._token
+
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+            self._refresh_at = 0.0
@@ -0,0 +1,357 @@
+"""
+Offline routing on a local road graph, as an alternative to OpenRouteService.
+
+    python -m routing.local_router build nodes.csv edges.csv graph/
+    python -m routing.local_router synthetic graph/ --spacing-km 2
+    python -m routing.local_router route graph/ 21.1458,79.0882 18.5204,73.8567
+
+The graph comes from an OSM-derived edge list: a node table (id, lat, lon)
+and an edge table (u, v, length_m, plus speed_kmh and oneway when known).
+It is stored as forward and reverse CSR adjacency in plain .npy files that
+are memory-mapped on load, so opening even a country-sized graph is
+instant. Queries run bidirectional A* on travel time and return the same
+(geometry, summary) pair as providers.get_route.
+
+Select it with EVISION_ROUTER=local and EVISION_ROAD_GRAPH=<graph dir>
+(see routing.providers).
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from lazy_utils import lazy_import
+
+sklearn_neighbors = lazy_import("sklearn.neighbors")
+
+GRAPH_FORMAT = 1
+EARTH_RADIUS_M = 6_371_008.8
+DEFAULT_SPEED_KMH = 50.0
+# Straight-line legs from the query points to the nearest graph nodes
+SNAP_SPEED_KMH = 20.0
+# Query points further than this from every node are outside the graph's coverage
+MAX_SNAP_KM = float(os.environ.get("EVISION_MAX_SNAP_KM", 5.0))
+# OSM oneway tags; any other value ("no", "reversible", missing, ...) is stored as two-way
+ONEWAY_FORWARD = ("yes", "true", "1")
+ONEWAY_REVERSE = ("-1", "reverse")
+ARRAYS = ("node_lat", "node_lon", "indptr", "indices", "time_s", "length_m",
+          "rev_indptr", "rev_indices", "rev_time_s", "rev_length_m")
+
+
+class NoRouteError(RuntimeError):
+    pass
+
+
+def _haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _csr(src, dst, columns, n_nodes):
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_nodes), out=indptr[1:])
+    return indptr, dst[order].astype(np.int32), [c[order] for c in columns]
+
+
+def _oneway_direction(values):
+    """ Per edge: 1 when only u -> v may be driven, -1 when only v -> u, 0 when both. """
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        return np.sign(values.fillna(0).to_numpy(dtype=np.float64)).astype(np.int8)
+    text = values.astype("string").str.strip().str.lower()
+    forward = text.isin(ONEWAY_FORWARD).fillna(False).to_numpy(dtype=bool)
+    reverse = text.isin(ONEWAY_REVERSE).fillna(False).to_numpy(dtype=bool)
+    return np.select([forward, reverse], [1, -1], 0).astype(np.int8)
+
+
+def build_graph(nodes, edges, out_dir):
+    """
+    Writes the CSR graph for `nodes` (id, lat, lon) and `edges` (u, v,
+    length_m[, speed_kmh][, oneway]) to out_dir. oneway takes OSM's values
+    ("yes" / "-1" for a road drivable only against u -> v); two-way edges are
+    stored in both directions, and edges whose endpoints are not in `nodes`
+    are dropped.
+    Returns the opened RoadGraph.
+    """
+    node_ids = nodes['id'].to_numpy()
+    order = np.argsort(node_ids, kind="stable")
+    sorted_ids = node_ids[order]
+
+    def index_of(ids):
+        pos = np.clip(np.searchsorted(sorted_ids, ids), 0, len(sorted_ids) - 1)
+        return order[pos], sorted_ids[pos] == ids
+
+    u, u_ok = index_of(edges['u'].to_numpy())
+    v, v_ok = index_of(edges['v'].to_numpy())
+    keep = u_ok & v_ok
+    length = edges['length_m'].to_numpy(dtype=np.float64)[keep]
+    speed = (edges['speed_kmh'].fillna(DEFAULT_SPEED_KMH).to_numpy(dtype=np.float64)[keep]
+             if 'speed_kmh' in edges else np.full(len(length), DEFAULT_SPEED_KMH))
+    direction = _oneway_direction(edges['oneway'])[keep] if 'oneway' in edges else np.zeros(len(length), np.int8)
+    u, v = u[keep], v[keep]
+    # Reverse one-way edges are stored as forward edges from v to u
+    reverse = direction < 0
+    u, v = np.where(reverse, v, u), np.where(reverse, u, v)
+    oneway = direction != 0
+
+    src = np.concatenate([u, v[~oneway]])
+    dst = np.concatenate([v, u[~oneway]])
+    length = np.concatenate([length, length[~oneway]])
+    time_s = length / (np.maximum(np.concatenate([speed, speed[~oneway]]), 1.0) / 3.6)
+
+    n = len(nodes)
+    arrays = {
+        "node_lat": nodes['lat'].to_numpy(dtype=np.float64),
+        "node_lon": nodes['lon'].to_numpy(dtype=np.float64),
+    }
+    arrays["indptr"], arrays["indices"], (arrays["time_s"], arrays["length_m"]) = _csr(
+        src, dst, [time_s.astype(np.float32), length.astype(np.float32)], n)
+    arrays["rev_indptr"], arrays["rev_indices"], (arrays["rev_time_s"], arrays["rev_length_m"]) = _csr(
+        dst, src, [time_s.astype(np.float32), length.astype(np.float32)], n)
+    # The A* heuristic divides straight-line distance by the fastest edge speed, so it never overestimates
+    # build_id tells a rebuilt graph apart, e.g. in the route cache key
+    meta = {"format": GRAPH_FORMAT, "build_id": uuid.uuid4().hex, "n_nodes": n, "n_edges": int(len(src)),
+            "max_speed_mps": float((length / np.maximum(time_s, 1e-9)).max() * (1 + 1e-6)) if len(src) else 1.0}
+
+    tmp = f"{out_dir.rstrip(os.sep)}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), values)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+    return RoadGraph(out_dir)
+
+
+class RoadGraph:
+    """ A CSR road graph opened from build_graph()'s directory (arrays are memory-mapped). """
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), "rb") as f:
+            raw = f.read()
+        meta = json.loads(raw)
+        if meta.get("format") != GRAPH_FORMAT:
+            raise ValueError(f"unsupported road graph format {meta.get('format')} in {path}")
+        self.path = path
+        # Graphs built before build_id existed are identified by their meta.json
+        self.build_id = meta.get("build_id") or hashlib.sha1(raw).hexdigest()
+        self.n_nodes = meta["n_nodes"]
+        self.n_edges = meta["n_edges"]
+        self.max_speed_mps = meta["max_speed_mps"]
+        for name in ARRAYS:
+            # Plain ndarray views of the mapping: same pages, without np.memmap's per-index overhead
+            setattr(self, name, np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")))
+        self._tree = None
+        self._tree_lock = threading.Lock()
+
+    def nearest_node(self, lat, lon):
+        """ (node, distance_m) of the graph node closest to (lat, lon). """
+        with self._tree_lock:
+            if self._tree is None:
+                coords = np.radians(np.column_stack([self.node_lat, self.node_lon]))
+                self._tree = sklearn_neighbors.BallTree(coords, metric="haversine")
+        dist, idx = self._tree.query(np.radians([[lat, lon]]), k=1)
+        return int(idx[0, 0]), float(dist[0, 0]) * EARTH_RADIUS_M
+
+    def shortest_path(self, source, target):
+        """
+        Fastest path as (nodes, time_s, length_m) by bidirectional A*.
+
+        Both searches use the average potential p(v) = (h_t(v) - h_s(v)) / 2,
+        which keeps the reduced edge costs consistent in either direction, so
+        the usual bidirectional Dijkstra stopping rule stays exact.
+        Raises NoRouteError when target is unreachable.
+        """
+        if source == target:
+            return [source], 0.0, 0.0
+        lat, lon = self.node_lat, self.node_lon
+        inv_speed = 1.0 / self.max_speed_mps
+        s_lat, s_lon, t_lat, t_lon = (math.radians(float(x)) for x in (lat[source], lon[source], lat[target], lon[target]))
+        cos_s, cos_t = math.cos(s_lat), math.cos(t_lat)
+        potentials = {}
+
+        def potential(node):
+            p = potentials.get(node)
+            if p is None:
+                a, b = math.radians(float(lat[node])), math.radians(float(lon[node]))
+                cos_a = math.cos(a)
+                h_t = math.asin(min(1.0, math.sqrt(math.sin((t_lat - a) / 2) ** 2 + cos_a * cos_t * math.sin((t_lon - b) / 2) ** 2)))
+                h_s = math.asin(min(1.0, math.sqrt(math.sin((a - s_lat) / 2) ** 2 + cos_s * cos_a * math.sin((b - s_lon) / 2) ** 2)))
+                p = potentials[node] = (h_t - h_s) * EARTH_RADIUS_M * inv_speed  # (2 R asin / v) / 2
+            return p
+
+        p_s, p_t = potential(source), potential(target)
+        # Per direction: distance, parent, heap of (reduced key, node), settled set, CSR arrays, potential sign
+        searches = (
+            ({source: 0.0}, {source: -1}, [(0.0, source)], set(), self.indptr, self.indices, self.time_s, 1.0, p_s),
+            ({target: 0.0}, {target: -1}, [(0.0, target)], set(), self.rev_indptr, self.rev_indices, self.rev_time_s, -1.0, -p_t),
+        )
+        best, meet = math.inf, -1
+        # Reduced length of the best s-t path found so far is best + p_t - p_s
+        offset = p_t - p_s
+        while searches[0][2] and searches[1][2]:
+            if searches[0][2][0][0] + searches[1][2][0][0] >= best + offset:
+                break
+            # Expand the side with the smaller frontier
+            side = 0 if len(searches[0][2]) <= len(searches[1][2]) else 1
+            dist, parent, heap, settled, indptr, indices, weights, sign, base = searches[side]
+            other_dist = searches[1 - side][0]
+            _, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            d_node = dist[node]
+            start, stop = int(indptr[node]), int(indptr[node + 1])
+            for nxt, w in zip(indices[start:stop].tolist(), weights[start:stop].tolist()):
+                d = d_node + w
+                if d < dist.get(nxt, math.inf):
+                    dist[nxt] = d
+                    parent[nxt] = node
+                    heapq.heappush(heap, (d + sign * potential(nxt) - base, nxt))
+                    if nxt in other_dist and d + other_dist[nxt] < best:
+                        best, meet = d + other_dist[nxt], nxt
+        if meet < 0:
+            raise NoRouteError("no road connection between the two points")
+
+        forward, backward = searches[0][1], searches[1][1]
+        path, node = [], meet
+        while node != -1:
+            path.append(node)
+            node = forward[node]
+        path.reverse()
+        node = backward[meet]
+        while node != -1:
+            path.append(node)
+            node = backward[node]
+        return path, best, self._path_length(path)
+
+    def _path_length(self, path):
+        total = 0.0
+        for a, b in zip(path[:-1], path[1:]):
+            start, stop = int(self.indptr[a]), int(self.indptr[a + 1])
+            targets = self.indices[start:stop]
+            hits = np.flatnonzero(targets == b)
+            total += float(self.length_m[start + hits].min()) if len(hits) else 0.0
+        return total
+
+    def route(self, start, end, max_snap_km=MAX_SNAP_KM):
+        """
+        (geometry, summary) between two (lat, lon) points, like
+        providers.get_route: geometry is a list of (lat, lon) and summary has
+        distance (m) and duration (s). The legs from each point to its
+        nearest graph node are included as straight lines at SNAP_SPEED_KMH.
+        Raises NoRouteError when either point is more than max_snap_km from
+        the graph.
+        """
+        source, snap_s = self.nearest_node(*start)
+        target, snap_t = self.nearest_node(*end)
+        for point, snap in ((start, snap_s), (end, snap_t)):
+            if snap > max_snap_km * 1000:
+                raise NoRouteError(f"{tuple(point)} is {snap / 1000:.1f} km from the nearest road in {self.path}")
+        path, time_s, length_m = self.shortest_path(source, target)
+        geometry = [tuple(start)] + list(zip(self.node_lat[path].tolist(), self.node_lon[path].tolist())) + [tuple(end)]
+        snap_m = snap_s + snap_t
+        return geometry, {"distance": length_m + snap_m, "duration": time_s + snap_m / (SNAP_SPEED_KMH / 3.6)}
+
+
+def synthetic_graph(lat_range=(18.0, 22.0), lon_range=(73.0, 80.0), spacing_km=2.0, seed=42):
+    """
+    Node and edge tables of a jittered grid road network for tests and
+    benchmarks: local roads at 40-60 km/h, with every 10th row and column a
+    90 km/h highway. Returns (nodes, edges) in build_graph()'s input format.
+    """
+    rng = np.random.default_rng(seed)
+    step = spacing_km / 111.0
+    lats = np.arange(lat_range[0], lat_range[1] + step / 2, step)
+    lons = np.arange(lon_range[0], lon_range[1] + step / 2, step)
+    rows, cols = len(lats), len(lons)
+    grid_lat, grid_lon = np.meshgrid(lats, lons, indexing="ij")
+    node_lat = (grid_lat + rng.uniform(-0.2, 0.2, grid_lat.shape) * step).ravel()
+    node_lon = (grid_lon + rng.uniform(-0.2, 0.2, grid_lon.shape) * step).ravel()
+    ids = np.arange(rows * cols).reshape(rows, cols)
+
+    u = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    v = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    highway = np.concatenate([np.repeat(np.arange(rows) % 10 == 0, cols - 1),
+                              np.tile(np.arange(cols) % 10 == 0, rows - 1)])
+    speed = np.where(highway, 90.0, rng.uniform(40.0, 60.0, len(u)))
+    edges = pd.DataFrame({
+        'u': u, 'v': v,
+        'length_m': _haversine_m(node_lat[u], node_lon[u], node_lat[v], node_lon[v]),
+        'speed_kmh': speed, 'oneway': False,
+    })
+    return pd.DataFrame({'id': ids.ravel(), 'lat': node_lat, 'lon': node_lon}), edges
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+def get_road_graph(path):
+    """ Opened graph for `path`, shared by all threads of the process; reopened after a rebuild. """
+    mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+    with _graphs_lock:
+        cached = _graphs.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _graphs[path] = (mtime, RoadGraph(path))
+        return cached[1]
+
+
+def _read_table(path):
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+
+
+def _point(text):
+    lat, lon = (float(v) for v in text.split(","))
+    return lat, lon
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build a graph from node and edge tables (CSV or Parquet)")
+    build.add_argument("nodes")
+    build.add_argument("edges")
+    build.add_argument("out_dir")
+    synth = sub.add_parser("synthetic", help="build a synthetic grid graph")
+    synth.add_argument("out_dir")
+    synth.add_argument("--spacing-km", type=float, default=2.0)
+    route = sub.add_parser("route", help="route between two lat,lon points")
+    route.add_argument("graph_dir")
+    route.add_argument("start", type=_point)
+    route.add_argument("end", type=_point)
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    if args.command == "route":
+        graph = get_road_graph(args.graph_dir)
+        try:
+            geometry, summary = graph.route(args.start, args.end)
+        except NoRouteError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"{summary['distance'] / 1000:.1f} km, {summary['duration'] / 3600:.2f} h, "
+              f"{len(geometry)} vertices in {time.perf_counter() - t0:.2f} s")
+        return 0
+    if args.command == "build":
+        graph = build_graph(_read_table(args.nodes), _read_table(args.edges), args.out_dir)
+    else:
+        graph = build_graph(*synthetic_graph(spacing_km=args.spacing_km), args.out_dir)
+    print(f"{graph.n_nodes} nodes, {graph.n_edges} directed edges in {time.perf_counter() - t0:.1f} s -> {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from routing.providers import show_nearby_chargers, get_poi
+
+# Keywords looked up around every charging stop that has chargers nearby
+POI_KEYWORDS = ("restaurant", "cafe", "tourist attraction")
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+    `rate` tokens are added per second up to `capacity`; acquire() blocks until one is free.
+    The bucket starts with `tokens` (default: full); a negative count delays the first acquire().
+    """
+
+    def __init__(self, rate, capacity=None, tokens=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = min(self.capacity, float(tokens)) if tokens is not None else self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# One limiter per process so every Streamlit session shares the MapmyIndia quota.
+# The old planner made 4 calls per stop and slept 1 s, i.e. ~4 requests/s.
+# Multi-process callers split the rate with set_mapmyindia_rate() in each process.
+MAPMYINDIA_RATE = 4
+MAPMYINDIA_LIMITER = TokenBucket(rate=MAPMYINDIA_RATE, capacity=MAPMYINDIA_RATE)
+
+
+def set_mapmyindia_rate(rate, start_delay_s=0.0):
+    """
+    Replaces this process's MapmyIndia limiter with one allowing `rate`
+    requests/s, whose first request waits `start_delay_s`.
+    """
+    global MAPMYINDIA_LIMITER
+    # A burst of at least one request, or acquire() could never succeed. It starts with a
+    # single request rather than a full burst, so workers sharing the quota can be staggered.
+    MAPMYINDIA_LIMITER = TokenBucket(rate=rate, capacity=max(rate, 1.0), tokens=1.0 - start_delay_s * rate)
+
+
+def _limited(limiter, fn, *args):
+    limiter.acquire()
+    return fn(*args)
+
+
+def iter_stop_details(points, token, poi_keywords=POI_KEYWORDS, limiter=None, max_workers=8):
+    """
+    Look up nearby chargers and POIs for every stop point concurrently,
+    yielding (index, chargers, {keyword: pois}) for each stop as soon as all
+    of its lookups have resolved, in completion order.
+
+    POIs are only requested for stops where chargers were found, as before.
+    The charger lookups are submitted by this call, not when iteration
+    starts, so they run while the caller does other work.
+    """
+    limiter = limiter or MAPMYINDIA_LIMITER
+    if not points:
+        return iter(())
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {
+        pool.submit(_limited, limiter, show_nearby_chargers, lat, lon, token): (i, None)
+        for i, (lat, lon) in enumerate(points)
+    }
+    return _iter_completed(pool, pending, points, token, poi_keywords, limiter)
+
+
+def _iter_completed(pool, pending, points, token, poi_keywords, limiter):
+    chargers_by_stop = [None] * len(points)
+    pois_by_stop = [{} for _ in points]
+    outstanding = [0] * len(points)
+
+    with pool:
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                i, keyword = pending.pop(fut)
+                if keyword is None:
+                    chargers_by_stop[i] = fut.result()
+                    if not chargers_by_stop[i]:
+                        yield i, chargers_by_stop[i], pois_by_stop[i]
+                        continue
+                    # Queue POI lookups for a stop as soon as its charger lookup resolves
+                    lat, lon = points[i]
+                    for kw in poi_keywords:
+                        pending[pool.submit(_limited, limiter, get_poi, lat, lon, token, kw)] = (i, kw)
+                    outstanding[i] = len(poi_keywords)
+                else:
+                    pois_by_stop[i][keyword] = fut.result()
+                    outstanding[i] -= 1
+                if outstanding[i] == 0:
+                    yield i, chargers_by_stop[i], pois_by_stop[i]
+
+
+def fetch_stop_details(points, token, poi_keywords=POI_KEYWORDS, limiter=None, max_workers=8):
+    """
+    Look up nearby chargers and POIs for every stop point concurrently.
+
+    POIs are only requested for stops where chargers were found, as before.
+    Returns a list aligned with `points`: [(chargers, {keyword: pois}), ...].
+    """
+    results = [([], {}) for _ in points]
+    for i, chargers, pois in iter_stop_details(points, token, poi_keywords, limiter, max_workers):
+        results[i] = (chargers, pois)
+    return results
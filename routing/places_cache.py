@@ -0,0 +1,81 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cache_utils import get_cache_dir
+
+# Stop points are rounded to 3 decimals (~110 m); nearby-search results do
+# not change meaningfully within that distance.
+COORD_DECIMALS = 3
+PLACES_TTL_S = 24 * 3600
+
+
+def places_key(keyword, lat, lon, decimals=COORD_DECIMALS):
+    return f"{' '.join(str(keyword).split()).casefold()}:{lat:.{decimals}f},{lon:.{decimals}f}"
+
+
+class PlacesCache:
+    """
+    On-disk cache of MapmyIndia nearby searches (chargers and POIs), shared by
+    every session and process on the host. Values are the JSON place lists;
+    empty results are cached too, so a stop with nothing nearby is not re-queried.
+    """
+
+    def __init__(self, path=None, ttl=PLACES_TTL_S):
+        self.path = path or os.path.join(get_cache_dir("places"), "places.sqlite")
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS places ("
+            "key TEXT PRIMARY KEY, places TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, keyword, lat, lon):
+        """ Returns the cached place list or None. """
+        key = places_key(keyword, lat, lon)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT places, expires_at FROM places WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= time.time():
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+        return json.loads(row[0])
+
+    def set(self, keyword, lat, lon, places):
+        key = places_key(keyword, lat, lon)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO places (key, places, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(places, separators=(",", ":")), time.time() + self.ttl),
+            )
+            self._conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM places WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM places")
+            self._conn.commit()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_places_cache():
+    """ Process-wide cache instance, shared by all Streamlit sessions. """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PlacesCache()
+        return _default_cache
@@ -0,0 +1,176 @@
+import os
+import threading
+
+import polyline
+
+from routing import http_client
+from routing.http_client import TokenCache
+
+from lazy_utils import lazy_import
+from routing.geocode_cache import get_geocode_cache
+from routing.places_cache import get_places_cache
+from routing.route_cache import get_route_cache
+from spatial.station_index import get_station_index, to_place_records
+
+# Only the local router needs it (and pandas with it)
+local_router = lazy_import("routing.local_router")
+
+# "api": MapmyIndia first, falling back to the offline station index when it finds nothing
+# "offline": offline station index only (no network)
+CHARGER_SOURCE = os.environ.get("EVISION_CHARGER_SOURCE", "api")
+OFFLINE_CHARGER_K = 5
+OFFLINE_CHARGER_RADIUS_KM = 25
+
+# "ors": OpenRouteService directions API
+# "local": bidirectional A* on the road graph in ROAD_GRAPH (see routing.local_router)
+ROUTER = os.environ.get("EVISION_ROUTER", "ors")
+ROAD_GRAPH = os.environ.get("EVISION_ROAD_GRAPH")
+
+# Base URL of each HTTP provider. Override through the environment or
+# configure_providers() to point the planner at a mirror or a local stub server.
+PROVIDER_URLS = {
+    "nominatim": os.environ.get("EVISION_NOMINATIM_URL", "https://nominatim.openstreetmap.org"),
+    "ors": os.environ.get("EVISION_ORS_URL", "https://api.openrouteservice.org"),
+    "mapmyindia_auth": os.environ.get("EVISION_MAPMYINDIA_AUTH_URL", "https://outpost.mapmyindia.com"),
+    "mapmyindia_places": os.environ.get("EVISION_MAPMYINDIA_PLACES_URL", "https://atlas.mapmyindia.com"),
+}
+CHARGER_KEYWORD = "ev+charging+station"
+
+
+class RouterConfigError(RuntimeError):
+    pass
+
+
+def configure_providers(**urls):
+    """ configure_providers(ors="http://127.0.0.1:8080") replaces the named base URLs. """
+    unknown = set(urls) - set(PROVIDER_URLS)
+    if unknown:
+        raise ValueError(f"Unknown providers: {', '.join(sorted(unknown))}")
+    PROVIDER_URLS.update({name: url.rstrip("/") for name, url in urls.items() if url})
+
+
+def provider_url(name, path):
+    return PROVIDER_URLS[name].rstrip("/") + path
+
+# --- External API helpers used by the trip planner ---
+def get_coords(city):
+    # Served from the two-tier geocode cache; unknown cities are cached as (None, None) too
+    cache = get_geocode_cache()
+    found, coords = cache.get(city)
+    if found:
+        return coords
+    coords = _fetch_coords(city)
+    cache.set(city, coords)
+    return coords
+
+def _fetch_coords(city):
+    url = provider_url("nominatim", f"/search?q={city}&format=json&limit=1")
+    response = http_client.get(url)
+    data = response.json()
+    if data:
+        return float(data[0]['lat']), float(data[0]['lon'])
+    return None, None
+
+def get_route(start, end, ors_api_key, profile="driving-car"):
+    # Repeated origin/destination pairs are served from the shared on-disk route cache
+    cache = get_route_cache()
+    graph = _road_graph() if ROUTER == "local" else None
+    # Local routes are cached apart from ORS ones and per graph build, so a new graph is not served stale routes
+    key = f"local:{graph.build_id}:{profile}" if graph is not None else profile
+    cached = cache.get(start, end, key)
+    if cached is not None:
+        return cached
+    if graph is not None:
+        geometry, summary = graph.route(start, end)
+    else:
+        geometry, summary = _fetch_route(start, end, ors_api_key, profile)
+    cache.set(start, end, key, geometry, summary)
+    return geometry, summary
+
+def _fetch_route(start, end, ors_api_key, profile):
+    url = provider_url("ors", f"/v2/directions/{profile}")
+    headers = {"Authorization": ors_api_key, "Content-Type": "application/json"}
+    body = {
+        "coordinates": [[start[1], start[0]], [end[1], end[0]]],
+        "instructions": False
+    }
+    res = http_client.post(url, json=body, headers=headers)
+    res.raise_for_status()
+    data = res.json()
+    geometry = polyline.decode(data['routes'][0]['geometry'])
+    summary = data['routes'][0]['summary']  # contains distance (m) and duration (s)
+    return geometry, summary
+
+def check_router_config():
+    """ Raises RouterConfigError when ROUTER cannot serve routes as configured. """
+    if ROUTER not in ("ors", "local"):
+        raise RouterConfigError(f"Unknown EVISION_ROUTER {ROUTER!r} (expected 'ors' or 'local')")
+    if ROUTER == "local" and not ROAD_GRAPH:
+        raise RouterConfigError("EVISION_ROUTER=local needs EVISION_ROAD_GRAPH set to a graph directory")
+    if ROUTER == "local" and not os.path.exists(os.path.join(ROAD_GRAPH, "meta.json")):
+        raise RouterConfigError(f"No road graph in {ROAD_GRAPH} (build one with python -m routing.local_router)")
+
+def _road_graph():
+    check_router_config()
+    return local_router.get_road_graph(ROAD_GRAPH)
+
+_token_caches = {}
+_token_caches_lock = threading.Lock()
+
+def get_mapmyindia_token(client_id, client_secret):
+    # One cached token per client, refreshed shortly before it expires
+    with _token_caches_lock:
+        cache = _token_caches.get(client_id)
+        if cache is None:
+            cache = TokenCache(lambda: _fetch_mapmyindia_token(client_id, client_secret))
+            _token_caches[client_id] = cache
+    return cache.get()
+
+def _fetch_mapmyindia_token(client_id, client_secret):
+    token_url = provider_url("mapmyindia_auth", "/api/security/oauth/token")
+    payload = {
+        "grant_type": "client_credentials",
+        "client_id": client_id,
+        "client_secret": client_secret
+    }
+    res = http_client.post(token_url, data=payload)
+    data = res.json()
+    return data.get("access_token"), data.get("expires_in", 0)
+
+def show_nearby_chargers(lat, lon, token):
+    if CHARGER_SOURCE == "offline":
+        return offline_nearby_chargers(lat, lon)
+    chargers = _fetch_nearby_chargers(lat, lon, token)
+    return chargers or offline_nearby_chargers(lat, lon)
+
+def offline_nearby_chargers(lat, lon, k=OFFLINE_CHARGER_K, radius_km=OFFLINE_CHARGER_RADIUS_KM):
+    nearest = get_station_index().nearest(lat, lon, k=k)
+    return to_place_records(nearest[nearest['distance_km'] <= radius_km])
+
+def _fetch_nearby_chargers(lat, lon, token):
+    return _cached_nearby(lat, lon, token, CHARGER_KEYWORD)
+
+def get_poi(lat, lon, token, keyword):
+    return _cached_nearby(lat, lon, token, keyword)
+
+def _cached_nearby(lat, lon, token, keyword):
+    # Shared on-disk cache; failed lookups are not cached
+    cache = get_places_cache()
+    places = cache.get(keyword, lat, lon)
+    if places is not None:
+        return places
+    places = _fetch_nearby(lat, lon, token, keyword)
+    if places is None:
+        return []
+    cache.set(keyword, lat, lon, places)
+    return places
+
+def _fetch_nearby(lat, lon, token, keyword):
+    url = provider_url("mapmyindia_places", f"/api/places/nearby/json?keywords={keyword}&refLocation={lat},{lon}")
+    headers = {"Authorization": f"Bearer {token}"}
+    res = http_client.get(url, headers=headers)
+    try:
+        data = res.json()
+        return data.get("suggestedLocations", [])
+    except:
+        return None
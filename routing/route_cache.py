@@ -0,0 +1,113 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from cache_utils import get_cache_dir
+
+# Endpoints are rounded to 3 decimals (~110 m), so replanning from the same
+# geocoded city always lands on the same key.
+COORD_DECIMALS = 3
+# Same precision as the encoded polyline ORS returns, so storage is lossless
+POLYLINE_SCALE = 1e5
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def route_key(start, end, profile, decimals=COORD_DECIMALS):
+    s = ",".join(f"{c:.{decimals}f}" for c in (start[0], start[1], end[0], end[1]))
+    return f"{profile}:{s}"
+
+
+def pack_geometry(geometry):
+    """ (lat, lon) vertices -> int32 blob at 1e-5 degree resolution (8 bytes per vertex). """
+    arr = np.rint(np.asarray(geometry, dtype=np.float64) * POLYLINE_SCALE).astype("<i4")
+    return arr.tobytes()
+
+
+def unpack_geometry(blob):
+    return (np.frombuffer(blob, dtype="<i4").reshape(-1, 2) / POLYLINE_SCALE).tolist()
+
+
+class RouteCache:
+    """
+    On-disk route cache shared by every session and process on the host.
+    Rows hold the packed geometry and the JSON summary; the least recently
+    used rows are evicted once the total payload exceeds max_bytes.
+    """
+
+    def __init__(self, path=None, max_bytes=MAX_CACHE_BYTES):
+        self.path = path or os.path.join(get_cache_dir("routes"), "routes.sqlite")
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS routes ("
+            "key TEXT PRIMARY KEY, geometry BLOB NOT NULL, summary TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS routes_last_access ON routes(last_access)")
+        self._conn.commit()
+
+    def get(self, start, end, profile):
+        """ Returns (geometry, summary) or None. """
+        key = route_key(start, end, profile)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT geometry, summary FROM routes WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE routes SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+        return unpack_geometry(row[0]), json.loads(row[1])
+
+    def set(self, start, end, profile, geometry, summary):
+        key = route_key(start, end, profile)
+        blob = pack_geometry(geometry)
+        summary_json = json.dumps(summary, separators=(",", ":"))
+        size = len(blob) + len(summary_json)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO routes (key, geometry, summary, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, blob, summary_json, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM routes").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM routes ORDER BY last_access"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM routes WHERE key = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM routes")
+            self._conn.commit()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_route_cache():
+    """ Process-wide cache instance, shared by all Streamlit sessions. """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = RouteCache()
+        return _default_cache
@@ -0,0 +1,55 @@
+from routing.charging_solver import solve_charging_plan
+from routing.geometry import place_stops
+from spatial.station_index import get_station_index
+
+# Chargers farther than this from the route are not considered as stops
+CORRIDOR_KM = 5.0
+
+
+def plan_charging_stops(route_path, cum_dist_km, battery_capacity, ev_range_km, avg_speed,
+                        charger_power, corridor_km=CORRIDOR_KM):
+    """
+    Charging stops for a decoded route.
+
+    Known stations within corridor_km of the route are handed to the
+    minimum-time solver; stations without a rated power are assumed to deliver
+    charger_power. When no feasible plan exists (e.g. no stations on the
+    corridor), falls back to the original rule of a stop every 80% of range.
+
+    Returns (stops, charging_time_hr, method) where each stop is a dict with
+    "route_index", "lat", "lon", "distance_km", "name". For the "heuristic"
+    method, names and charging time are None and the caller applies its flat
+    per-stop charging estimate.
+    """
+    candidates = get_station_index().along_route(route_path, corridor_km=corridor_km)
+    # Battery-swap sites cannot charge a car
+    candidates = candidates[candidates['station_type'] != 'battery_swapping']
+    if len(candidates):
+        route_index = candidates['route_index'].to_numpy()
+        plan = solve_charging_plan(
+            positions_km=cum_dist_km[route_index],
+            powers_kw=candidates['power_kw'].fillna(charger_power).to_numpy(),
+            total_km=float(cum_dist_km[-1]),
+            battery_kwh=battery_capacity,
+            ev_range_km=ev_range_km,
+            avg_speed_kmh=avg_speed,
+            detour_km=candidates['distance_km'].to_numpy(),
+        )
+        if plan["feasible"]:
+            stops = []
+            for s in plan["stops"]:
+                row = candidates.iloc[s["candidate"]]
+                stops.append({
+                    "route_index": int(row['route_index']), "lat": float(row['latitude']),
+                    "lon": float(row['longitude']), "distance_km": s["position_km"], "name": row['name'],
+                })
+            return stops, plan["charging_time_h"], "optimized"
+
+    safe_limit_km = int(ev_range_km * 0.8)
+    stop_indices = place_stops(cum_dist_km, safe_limit_km)
+    stops = [
+        {"route_index": int(i), "lat": route_path[i][0], "lon": route_path[i][1],
+         "distance_km": float(cum_dist_km[i]), "name": None}
+        for i in stop_indices
+    ]
+    return stops, None, "heuristic"
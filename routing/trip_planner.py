@@ -0,0 +1,150 @@
+import os
+
+from routing.geometry import cumulative_distance_km
+from routing.lookups import iter_stop_details
+from routing.providers import RouterConfigError, get_coords, get_route, get_mapmyindia_token, local_router
+from routing.stop_planner import plan_charging_stops
+from timing_utils import span
+
+ORS_API_KEY = os.environ.get("EVISION_ORS_API_KEY", "5b3ce3597851110001cf6248f6655560e2024f9aaef104f6bc121d7b")
+MAPMYINDIA_CLIENT_ID = os.environ.get(
+    "EVISION_MAPMYINDIA_CLIENT_ID",
+    "96dHZVzsAuukZtfZagLKfNcqzXoFF094ZyfjQqjOfprR17jCqYuLNmRto4oA_yan7Jye0lFlO2wHrJyVmu23Gw==",
+)
+MAPMYINDIA_CLIENT_SECRET = os.environ.get(
+    "EVISION_MAPMYINDIA_CLIENT_SECRET",
+    "lrFxI-iSEg_5Bfm_-_C7psNkJrwfuKA6GeYQzbC4um7j8iR1_M6r4zE0MGKKHaD5IYWoO15DXvYo6aWm3EqAw1gU5eTSXKaT",
+)
+
+CHARGER_POWER_KW = 50
+# ORS durations assume free-flowing traffic; the planner pads them by 50%
+DRIVING_TIME_FACTOR = 1.5
+
+
+class InvalidCityError(ValueError):
+    pass
+
+
+class RouteUnavailableError(RuntimeError):
+    pass
+
+
+def _stop_record(planned, chargers, pois):
+    return {
+        "distance_km": planned["distance_km"], "lat": planned["lat"], "lon": planned["lon"],
+        "name": planned["name"], "chargers": chargers, "pois": pois,
+    }
+
+
+def plan_trip_stream(start_city, end_city, battery_capacity, ev_range_km, avg_speed,
+                     charger_power=CHARGER_POWER_KW, with_details=True):
+    """
+    plan_trip() as a stream of events, so a UI can show each part as soon as
+    it is known. Yields, in order:
+
+      {"event": "route", "start", "end", "route_path", "total_dist_km", "driving_time_hr"}
+      {"event": "stops", "stops": [{"distance_km", "lat", "lon", "name"}, ...],
+       "stop_method", "charging_time_hr"}   (charging time before chargers are known)
+      {"event": "stop", "index", "stop"}    once per stop, in completion order, when
+                                            its chargers and POIs have resolved
+      {"event": "done", "plan"}             the same dict plan_trip() returns
+
+    Raises InvalidCityError (before the first event) when a city cannot be geocoded,
+    and RouteUnavailableError when the router is misconfigured or finds no road
+    between the cities.
+    """
+    with span("geocode"):
+        start = get_coords(start_city)
+        end = get_coords(end_city)
+    if not all(start) or not all(end):
+        raise InvalidCityError("Invalid city names")
+
+    with span("route"):
+        try:
+            route_path, route_summary = get_route(start, end, ORS_API_KEY)
+        except (RouterConfigError, local_router.NoRouteError) as e:
+            raise RouteUnavailableError(str(e)) from e
+    driving_time_hr = (route_summary['duration'] / 3600) * DRIVING_TIME_FACTOR
+
+    with span("route_geometry"):
+        # Segment lengths and stop vertices are computed in one vectorized pass
+        cum_dist_km = cumulative_distance_km(route_path)
+        total_dist_km = float(cum_dist_km[-1])
+    yield {"event": "route", "start": start, "end": end, "route_path": route_path,
+           "total_dist_km": total_dist_km, "driving_time_hr": driving_time_hr}
+
+    with span("stop_planning"):
+        # Minimum-time stops at known chargers along the route (falls back to a stop every 80% of range)
+        planned_stops, planned_charging_hr, stop_method = plan_charging_stops(
+            route_path, cum_dist_km, battery_capacity, ev_range_km, avg_speed, charger_power
+        )
+    stop_points = [(s["lat"], s["lon"]) for s in planned_stops]
+    stops_event = {"event": "stops", "stops": planned_stops, "stop_method": stop_method,
+                   "charging_time_hr": planned_charging_hr if stop_method == "optimized"
+                   else len(planned_stops) * ((0.8 * battery_capacity) / charger_power)}
+
+    stop_details = [([], {}) for _ in stop_points]
+    if with_details and stop_points:
+        # Chargers and POIs for all stops are fetched concurrently under the provider rate limit
+        with span("token"):
+            token = get_mapmyindia_token(MAPMYINDIA_CLIENT_ID, MAPMYINDIA_CLIENT_SECRET)
+        # Wall time of the lookups, including whatever the consumer does between events.
+        # They are submitted before the stops event, so they run while the consumer renders it.
+        with span("charger_poi_lookup"):
+            details = iter_stop_details(stop_points, token)
+            yield stops_event
+            for i, chargers, pois in details:
+                stop_details[i] = (chargers, pois)
+                yield {"event": "stop", "index": i, "stop": _stop_record(planned_stops[i], chargers, pois)}
+    else:
+        yield stops_event
+        for i, planned in enumerate(planned_stops):
+            yield {"event": "stop", "index": i, "stop": _stop_record(planned, [], {})}
+
+    stops = []
+    map_stops = [("Start", route_path[0][0], route_path[0][1])]
+    for planned, (chargers, pois) in zip(planned_stops, stop_details):
+        stops.append(_stop_record(planned, chargers, pois))
+        if chargers:
+            map_stops.append((planned["name"] or chargers[0].get("placeName", "Charger"), planned["lat"], planned["lon"]))
+        elif planned["name"] or not with_details:
+            map_stops.append((planned["name"] or "Charging Stop", planned["lat"], planned["lon"]))
+    map_stops.append(("Destination", route_path[-1][0], route_path[-1][1]))
+
+    num_charging_stops = max(len(map_stops) - 2, 0)
+    if stop_method == "optimized":
+        charging_time_hr = planned_charging_hr
+    else:
+        charging_time_hr = num_charging_stops * ((0.8 * battery_capacity) / charger_power)
+
+    yield {"event": "done", "plan": {
+        "start_city": start_city, "end_city": end_city, "start": start, "end": end,
+        "route_path": route_path,
+        "total_dist_km": total_dist_km,
+        "driving_time_hr": driving_time_hr,
+        "charging_time_hr": charging_time_hr,
+        "total_trip_time_hr": driving_time_hr + charging_time_hr,
+        "num_charging_stops": num_charging_stops,
+        "stop_method": stop_method,
+        "stops": stops,
+        "map_stops": map_stops,
+    }}
+
+
+def plan_trip(start_city, end_city, battery_capacity, ev_range_km, avg_speed,
+              charger_power=CHARGER_POWER_KW, with_details=True):
+    """
+    Plan one EV trip: geocode both cities, route between them, place the
+    charging stops and (with_details) look up chargers and POIs around each.
+
+    Returns a dict with the coordinates, "route_path", the distance and time
+    figures, "stop_method" and "stops" (one dict per charging stop with
+    "distance_km", "lat", "lon", "name", "chargers" and "pois" by keyword).
+    "map_stops" lists (name, lat, lon) from start to destination, as the map
+    draws them. Raises InvalidCityError when a city cannot be geocoded and
+    RouteUnavailableError when no route can be found between them.
+    """
+    for event in plan_trip_stream(start_city, end_city, battery_capacity, ev_range_km, avg_speed,
+                                  charger_power, with_details):
+        if event["event"] == "done":
+            return event["plan"]
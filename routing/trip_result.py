@@ -0,0 +1,222 @@
+import hashlib
+import json
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+# Only what the results page shows is kept from the provider responses
+MAX_CHARGERS = 5
+MAX_POIS = 3
+POI_KEYWORDS = ("restaurant", "cafe", "tourist attraction")
+# Route vertices are stored as float32 (sub-metre precision at Indian latitudes)
+ROUTE_DTYPE = np.dtype("<f4")
+FORMAT = 1
+# Shared by every session; least recently used results are dropped beyond this
+STORE_MAX_BYTES = 64 * 1024 * 1024
+# A session forgets its result after this long without displaying it
+SESSION_RESULT_TTL_S = 30 * 60
+
+
+class Place:
+    """ A charger or POI near a stop (MapmyIndia nearby-search fields the page uses). """
+    __slots__ = ("name", "address", "distance_m", "eloc")
+
+    def __init__(self, name, address, distance_m, eloc):
+        self.name = name
+        self.address = address
+        self.distance_m = distance_m
+        self.eloc = eloc
+
+    @classmethod
+    def from_provider(cls, place):
+        return cls(place.get("placeName"), place.get("placeAddress"), place.get("distance"), place.get("eLoc"))
+
+    def to_list(self):
+        return [self.name, self.address, self.distance_m, self.eloc]
+
+
+class ChargingStop:
+    __slots__ = ("distance_km", "lat", "lon", "name", "chargers", "pois")
+
+    def __init__(self, distance_km, lat, lon, name, chargers, pois):
+        self.distance_km = distance_km
+        self.lat = lat
+        self.lon = lon
+        self.name = name
+        self.chargers = chargers  # tuple of Place
+        self.pois = pois          # {keyword: tuple of Place}
+
+    @classmethod
+    def from_plan(cls, stop):
+        """ From one of plan_trip()'s "stops" dicts, keeping only what the page shows. """
+        return cls(
+            float(stop["distance_km"]), float(stop["lat"]), float(stop["lon"]), stop["name"],
+            tuple(Place.from_provider(c) for c in stop["chargers"][:MAX_CHARGERS]),
+            {kw: tuple(Place.from_provider(p) for p in stop["pois"][kw][:MAX_POIS])
+             for kw in POI_KEYWORDS if stop["pois"].get(kw)},
+        )
+
+
+class TripResult:
+    """
+    Compact, immutable form of a plan_trip() result for display: figures as
+    floats, the route as an (n, 2) float32 array and the stops as slotted
+    objects. Formatting and the map are produced at display time.
+    """
+    __slots__ = ("start_city", "end_city", "start", "end", "route", "total_dist_km", "driving_time_hr",
+                 "charging_time_hr", "total_trip_time_hr", "num_charging_stops", "stop_method", "stops",
+                 "map_stops")
+
+    def __init__(self, start_city, end_city, start, end, route, total_dist_km, driving_time_hr,
+                 charging_time_hr, total_trip_time_hr, num_charging_stops, stop_method, stops, map_stops):
+        self.start_city = start_city
+        self.end_city = end_city
+        self.start = start
+        self.end = end
+        self.route = route
+        self.total_dist_km = total_dist_km
+        self.driving_time_hr = driving_time_hr
+        self.charging_time_hr = charging_time_hr
+        self.total_trip_time_hr = total_trip_time_hr
+        self.num_charging_stops = num_charging_stops
+        self.stop_method = stop_method
+        self.stops = stops
+        self.map_stops = map_stops  # tuple of (name, lat, lon), start to destination
+
+    @classmethod
+    def from_plan(cls, plan):
+        stops = tuple(ChargingStop.from_plan(s) for s in plan["stops"])
+        return cls(
+            plan["start_city"], plan["end_city"], tuple(plan["start"]), tuple(plan["end"]),
+            np.asarray(plan["route_path"], dtype=ROUTE_DTYPE).reshape(-1, 2),
+            float(plan["total_dist_km"]), float(plan["driving_time_hr"]), float(plan["charging_time_hr"]),
+            float(plan["total_trip_time_hr"]), int(plan["num_charging_stops"]), plan["stop_method"],
+            stops, tuple((name, float(lat), float(lon)) for name, lat, lon in plan["map_stops"]),
+        )
+
+    def to_bytes(self):
+        """
+        <u32 header length><zlib JSON header><float32 route vertices>. The
+        encoding is deterministic, so equal plans give identical bytes.
+        """
+        header = {
+            "format": FORMAT,
+            "start_city": self.start_city, "end_city": self.end_city,
+            "start": list(self.start), "end": list(self.end),
+            "total_dist_km": self.total_dist_km, "driving_time_hr": self.driving_time_hr,
+            "charging_time_hr": self.charging_time_hr, "total_trip_time_hr": self.total_trip_time_hr,
+            "num_charging_stops": self.num_charging_stops, "stop_method": self.stop_method,
+            "stops": [
+                [s.distance_km, s.lat, s.lon, s.name, [c.to_list() for c in s.chargers],
+                 {kw: [p.to_list() for p in places] for kw, places in s.pois.items()}]
+                for s in self.stops
+            ],
+            "map_stops": [list(s) for s in self.map_stops],
+        }
+        packed = zlib.compress(json.dumps(header, separators=(",", ":"), sort_keys=True).encode())
+        route = np.ascontiguousarray(self.route, dtype=ROUTE_DTYPE)
+        return struct.pack("<I", len(packed)) + packed + route.tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob):
+        """ Inverse of to_bytes(); the route is a read-only view into `blob`, not a copy. """
+        (size,) = struct.unpack_from("<I", blob)
+        header = json.loads(zlib.decompress(blob[4:4 + size]))
+        if header["format"] != FORMAT:
+            raise ValueError(f"unsupported trip result format {header['format']}")
+        route = np.frombuffer(blob, dtype=ROUTE_DTYPE, offset=4 + size).reshape(-1, 2)
+        stops = tuple(
+            ChargingStop(d, lat, lon, name, tuple(Place(*c) for c in chargers),
+                         {kw: tuple(Place(*p) for p in places) for kw, places in pois.items()})
+            for d, lat, lon, name, chargers, pois in header["stops"]
+        )
+        return cls(
+            header["start_city"], header["end_city"], tuple(header["start"]), tuple(header["end"]), route,
+            header["total_dist_km"], header["driving_time_hr"], header["charging_time_hr"],
+            header["total_trip_time_hr"], header["num_charging_stops"], header["stop_method"],
+            stops, tuple(tuple(s) for s in header["map_stops"]),
+        )
+
+
+class TripResultStore:
+    """
+    Content-addressed, in-process store of serialized TripResults shared by
+    all sessions. A result is serialized once on put(); identical plans from
+    different sessions share one entry. Bounded by total bytes (LRU).
+    """
+
+    def __init__(self, max_bytes=STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._blobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result):
+        """ Stores the result and returns its content key. """
+        blob = result.to_bytes()
+        key = hashlib.sha1(blob).hexdigest()
+        with self._lock:
+            if key in self._blobs:
+                self._blobs.move_to_end(key)
+                return key
+            self._blobs[key] = blob
+            self.nbytes += len(blob)
+            while self.nbytes > self.max_bytes and len(self._blobs) > 1:
+                _, dropped = self._blobs.popitem(last=False)
+                self.nbytes -= len(dropped)
+        return key
+
+    def get(self, key):
+        """ The stored TripResult, or None if it was never stored or has been evicted. """
+        with self._lock:
+            blob = self._blobs.get(key)
+            if blob is None:
+                return None
+            self._blobs.move_to_end(key)
+        return TripResult.from_bytes(blob)
+
+    def __len__(self):
+        return len(self._blobs)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_trip_result_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = TripResultStore()
+        return _default_store
+
+
+def remember_trip_result(session_state, result, timings=None):
+    """
+    Keeps only the content key (plus the trace record, if any) in the
+    session; the result itself lives in the shared store.
+    """
+    session_state["trip_results"] = {
+        "key": get_trip_result_store().put(result), "seen_at": time.time(), "timings": timings,
+    }
+
+
+def recall_trip_result(session_state, ttl=SESSION_RESULT_TTL_S):
+    """
+    (TripResult, timings) for the session's last plan, or (None, None) when
+    there is none or it went stale (unseen for `ttl` seconds or evicted from
+    the shared store); a stale entry is dropped from the session.
+    """
+    entry = session_state.get("trip_results")
+    if not entry:
+        return None, None
+    now = time.time()
+    result = get_trip_result_store().get(entry["key"]) if now - entry["seen_at"] <= ttl else None
+    if result is None:
+        session_state["trip_results"] = None
+        return None, None
+    entry["seen_at"] = now
+    return result, entry["timings"]
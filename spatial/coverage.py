@@ -0,0 +1,208 @@
+"""
+Coverage gaps and new-site recommendations for one city.
+
+Run from the repo root:
+    python -m spatial.coverage Nagpur --sites 5 --radius-km 2
+
+A dense grid of candidate cells is laid over the city and the distance from
+every cell to its nearest station is found in one KD-tree query. A cell is
+covered when a station lies within the service radius, and counts as demand
+when it is within reach of the existing network (open country around the
+city is not a gap). New sites are then picked greedily, each one covering
+the most still-uncovered demand cells, with lazily re-evaluated gains
+(CELF): coverage is submodular, so a stale gain is an upper bound and most
+candidates are never re-scored.
+"""
+import argparse
+import heapq
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from lazy_utils import lazy_import
+from preprocessing.station_store import STATION_DATA_PATH, load_stations
+
+sklearn_neighbors = lazy_import("sklearn.neighbors")
+scipy_signal = lazy_import("scipy.signal")
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON = 111.320  # at the equator; scaled by cos(latitude)
+CELL_KM = 0.05
+SERVICE_RADIUS_KM = 2.0
+SITE_SPACING_KM = 0.25
+# Cells further than this from every station are outside the served area
+DEMAND_REACH_KM = 6.0
+GRID_PAD_KM = 3.0
+# Stations further than this from the city's median position are data errors
+CITY_RADIUS_KM = 60.0
+
+
+class CoverageGrid:
+    """ Regular grid in a local equirectangular projection (km east/north of an origin). """
+    __slots__ = ("lat0", "lon0", "cell_km", "x0", "y0", "shape")
+
+    def __init__(self, lat0, lon0, cell_km, x0, y0, shape):
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.cell_km = cell_km
+        self.x0 = x0
+        self.y0 = y0
+        self.shape = shape  # (rows, cols); row 0 is the southern edge
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1]
+
+    def project(self, lat, lon):
+        """ (x_km, y_km) of lat/lon points relative to the grid origin. """
+        kx = KM_PER_DEG_LON * np.cos(np.radians(self.lat0))
+        return ((np.asarray(lon, dtype=np.float64) - self.lon0) * kx,
+                (np.asarray(lat, dtype=np.float64) - self.lat0) * KM_PER_DEG_LAT)
+
+    def cell_latlon(self, rows, cols):
+        kx = KM_PER_DEG_LON * np.cos(np.radians(self.lat0))
+        x = self.x0 + (np.asarray(cols) + 0.5) * self.cell_km
+        y = self.y0 + (np.asarray(rows) + 0.5) * self.cell_km
+        return self.lat0 + y / KM_PER_DEG_LAT, self.lon0 + x / kx
+
+    def cell_centres_km(self):
+        """ (size, 2) x/y of every cell centre, row-major. """
+        rows, cols = self.shape
+        x = self.x0 + (np.arange(cols) + 0.5) * self.cell_km
+        y = self.y0 + (np.arange(rows) + 0.5) * self.cell_km
+        xx, yy = np.meshgrid(x, y)
+        return np.column_stack([xx.ravel(), yy.ravel()])
+
+
+def city_stations(df, city, radius_km=CITY_RADIUS_KM):
+    """ The city's stations, without rows far from the city's median position. """
+    stations = df.loc[df['city'] == city, ['latitude', 'longitude']].dropna()
+    lat0, lon0 = stations['latitude'].median(), stations['longitude'].median()
+    dx = (stations['longitude'] - lon0) * KM_PER_DEG_LON * np.cos(np.radians(lat0))
+    dy = (stations['latitude'] - lat0) * KM_PER_DEG_LAT
+    return stations[np.hypot(dx, dy) <= radius_km]
+
+
+def city_grid(stations, cell_km=CELL_KM, pad_km=GRID_PAD_KM):
+    """ Grid covering the stations' bounding box plus pad_km on every side. """
+    lat0, lon0 = float(stations['latitude'].median()), float(stations['longitude'].median())
+    grid = CoverageGrid(lat0, lon0, cell_km, 0.0, 0.0, (0, 0))
+    x, y = grid.project(stations['latitude'], stations['longitude'])
+    grid.x0, grid.y0 = float(x.min() - pad_km), float(y.min() - pad_km)
+    grid.shape = (int(np.ceil((y.max() + pad_km - grid.y0) / cell_km)),
+                  int(np.ceil((x.max() + pad_km - grid.x0) / cell_km)))
+    return grid
+
+
+def distance_to_nearest(stations, grid):
+    """ (rows, cols) float32 km from each cell centre to the nearest station, in one KD-tree query. """
+    sx, sy = grid.project(stations['latitude'], stations['longitude'])
+    tree = sklearn_neighbors.KDTree(np.column_stack([sx, sy]))
+    dist, _ = tree.query(grid.cell_centres_km(), k=1)
+    return dist[:, 0].astype(np.float32).reshape(grid.shape)
+
+
+def _disk(radius_cells):
+    r = int(np.floor(radius_cells))
+    yy, xx = np.mgrid[-r:r + 1, -r:r + 1]
+    return (xx ** 2 + yy ** 2 <= radius_cells ** 2), r
+
+
+def recommend_sites(dist_km, grid, n_sites, radius_km=SERVICE_RADIUS_KM, site_spacing_km=SITE_SPACING_KM,
+                    reach_km=DEMAND_REACH_KM):
+    """
+    Greedy maximum coverage: up to n_sites new sites (taken from a lattice
+    every site_spacing_km) that each add the most uncovered demand cells
+    (between radius_km and reach_km from a station) within radius_km.
+    Returns a DataFrame of latitude, longitude, new_covered_km2.
+
+    Initial gains for every candidate come from one FFT convolution of the
+    uncovered mask with the service disk; afterwards a candidate's gain is
+    only recomputed (over its own disk) when it reaches the top of the heap.
+    """
+    uncovered = (dist_km > radius_km) & (dist_km <= reach_km)
+    disk, r = _disk(radius_km / grid.cell_km)
+    stride = max(1, int(round(site_spacing_km / grid.cell_km)))
+    rows, cols = np.mgrid[stride // 2:grid.shape[0]:stride, stride // 2:grid.shape[1]:stride]
+    rows, cols = rows.ravel(), cols.ravel()
+
+    gains = np.rint(scipy_signal.fftconvolve(uncovered.astype(np.float32), disk.astype(np.float32), mode="same"))
+    initial = gains[rows, cols].astype(np.int64)
+    heap = [(-g, i) for i, g in enumerate(initial.tolist()) if g > 0]
+    heapq.heapify(heap)
+
+    padded = np.pad(uncovered, r)
+    picked, covered = [], []
+    while heap and len(picked) < n_sites:
+        neg_gain, i = heapq.heappop(heap)
+        window = padded[rows[i]:rows[i] + 2 * r + 1, cols[i]:cols[i] + 2 * r + 1]
+        gain = int(np.count_nonzero(window & disk))
+        if gain == 0:
+            continue
+        if heap and gain < -heap[0][0]:
+            heapq.heappush(heap, (-gain, i))
+            continue
+        window[disk] = False
+        picked.append(i)
+        covered.append(gain)
+
+    lat, lon = grid.cell_latlon(rows[picked], cols[picked])
+    return pd.DataFrame({
+        'latitude': lat, 'longitude': lon,
+        'new_covered_km2': np.asarray(covered, dtype=np.float64) * grid.cell_km ** 2,
+    })
+
+
+def analyze_city(df, city, n_sites=5, radius_km=SERVICE_RADIUS_KM, cell_km=CELL_KM,
+                 site_spacing_km=SITE_SPACING_KM, reach_km=DEMAND_REACH_KM):
+    """
+    Coverage summary for one city: {"grid", "dist_km", "sites", "cells",
+    "covered_share", "covered_share_after", "mean_dist_km"}. Shares and the
+    mean distance to the nearest station are over the demand cells (within
+    reach_km of a station).
+    """
+    stations = city_stations(df, city)
+    grid = city_grid(stations, cell_km)
+    dist_km = distance_to_nearest(stations, grid)
+    sites = recommend_sites(dist_km, grid, n_sites, radius_km, site_spacing_km, reach_km)
+    demand = dist_km <= reach_km
+    covered = float(np.count_nonzero(dist_km <= radius_km))
+    n_demand = float(np.count_nonzero(demand))
+    return {
+        "grid": grid,
+        "dist_km": dist_km,
+        "sites": sites,
+        "cells": grid.size,
+        "covered_share": covered / n_demand,
+        "covered_share_after": (covered + sites['new_covered_km2'].sum() / cell_km ** 2) / n_demand,
+        "mean_dist_km": float(dist_km[demand].mean()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("city")
+    parser.add_argument("--data", default=STATION_DATA_PATH)
+    parser.add_argument("--sites", type=int, default=5)
+    parser.add_argument("--radius-km", type=float, default=SERVICE_RADIUS_KM)
+    parser.add_argument("--cell-km", type=float, default=CELL_KM)
+    parser.add_argument("--site-spacing-km", type=float, default=SITE_SPACING_KM)
+    parser.add_argument("--reach-km", type=float, default=DEMAND_REACH_KM)
+    args = parser.parse_args(argv)
+
+    df = load_stations(args.data, columns=['latitude', 'longitude', 'city'])
+    if not (df['city'] == args.city).any():
+        parser.error(f"no stations in {args.city!r}")
+    t0 = time.perf_counter()
+    result = analyze_city(df, args.city, args.sites, args.radius_km, args.cell_km, args.site_spacing_km, args.reach_km)
+    print(f"{result['cells']:,} cells in {time.perf_counter() - t0:.2f} s; "
+          f"covered {result['covered_share']:.1%} -> {result['covered_share_after']:.1%} "
+          f"of demand cells (mean distance to a station {result['mean_dist_km']:.2f} km)")
+    print(result["sites"].to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Multi-resolution station density tiles.
+
+Build (or rebuild) for the current dataset from the repo root:
+    python -m spatial.density_tiles
+
+Stations are binned into Web Mercator tiles at several zoom levels. Each
+occupied tile stores its station count, the stations' centroid and the most
+common city; a summed-area table per level answers "how many stations in
+this viewport" in constant time. Everything lives in one uncompressed .npz
+per dataset version, so loading it is a handful of array reads.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache_utils import get_cache_dir
+from preprocessing.station_store import STATION_DATA_PATH, load_stations, station_data_version
+
+# Tile zoom levels; 12 is ~10 km tiles at Indian latitudes
+LEVELS = (4, 6, 8, 10, 12)
+# Bump when the file layout changes so old files are rebuilt
+TILES_FORMAT = 1
+MAX_LAT = 85.05112878  # Web Mercator limit
+# Points this close to (0, 0) are missing coordinates, not stations in the Gulf of Guinea
+NULL_ISLAND_DEG = 1.0
+
+
+def tile_xy(lat, lon, zoom):
+    """ Web Mercator tile indices of the points at the given zoom. """
+    n = 1 << zoom
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_LAT, MAX_LAT))
+    x = np.floor((np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_bounds(x, y, zoom):
+    """ (lat_min, lon_min, lat_max, lon_max) of tiles x, y. """
+    n = float(1 << zoom)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lat_max = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n))))
+    lat_min = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n))))
+    return lat_min, x / n * 360.0 - 180.0, lat_max, (x + 1) / n * 360.0 - 180.0
+
+
+def _empty_level():
+    return {
+        "window": np.zeros(4, dtype=np.int64),
+        "cells": np.zeros(0, dtype=np.int64),
+        "row_ptr": np.zeros(1, dtype=np.int64),
+        "count": np.zeros(0, dtype=np.uint32),
+        "lat": np.zeros(0, dtype=np.float32),
+        "lon": np.zeros(0, dtype=np.float32),
+        "city": np.zeros(0, dtype=np.uint16),
+        "sat": np.zeros((1, 1), dtype=np.uint32),
+    }
+
+
+def _build_level(lat, lon, city_codes, n_cities, zoom):
+    if len(lat) == 0:
+        return _empty_level()
+    x, y = tile_xy(lat, lon, zoom)
+    x0, y0 = x.min(), y.min()
+    w, h = int(x.max() - x0 + 1), int(y.max() - y0 + 1)
+    # Row-major cell id inside the level's bounding window
+    flat = (y - y0) * w + (x - x0)
+    cells, owner, counts = np.unique(flat, return_inverse=True, return_counts=True)
+
+    # Dominant city per cell: most frequent (cell, city) pair, lowest city code on ties
+    pairs, pair_counts = np.unique(owner * n_cities + city_codes, return_counts=True)
+    pair_cell = pairs // n_cities
+    order = np.lexsort((-pair_counts, pair_cell))
+    first = order[np.r_[True, pair_cell[order][1:] != pair_cell[order][:-1]]]
+
+    grid = np.zeros((h + 1, w + 1), dtype=np.uint32)
+    np.add.at(grid, ((cells // w) + 1, (cells % w) + 1), counts)
+    return {
+        "window": np.array([x0, y0, w, h], dtype=np.int64),
+        "cells": cells.astype(np.int64),
+        # cells[row_ptr[r]:row_ptr[r + 1]] are the occupied cells of window row r
+        "row_ptr": np.searchsorted(cells // w, np.arange(h + 1)).astype(np.int64),
+        "count": counts.astype(np.uint32),
+        "lat": (np.bincount(owner, lat) / counts).astype(np.float32),
+        "lon": (np.bincount(owner, lon) / counts).astype(np.float32),
+        "city": (pairs[first] % n_cities).astype(np.uint16),
+        "sat": grid.cumsum(axis=0).cumsum(axis=1).astype(np.uint32),
+    }
+
+
+def build_density_tiles(df, levels=LEVELS):
+    """
+    Tile arrays for the stations in `df` (latitude, longitude, city).
+    Rows without coordinates, or with placeholder coordinates near (0, 0),
+    are left out: they would stretch every level's window across the globe.
+    With no stations left, every level is empty and queries return nothing.
+    """
+    df = df[['latitude', 'longitude', 'city']].dropna(subset=['latitude', 'longitude'])
+    df = df[(df['latitude'].abs() >= NULL_ISLAND_DEG) | (df['longitude'].abs() >= NULL_ISLAND_DEG)]
+    cities, city_codes = np.unique(df['city'].fillna("").astype(str).to_numpy(), return_inverse=True)
+    # Fixed-width text even when empty, so the .npz loads without pickle
+    cities = cities.astype(str)
+    lat = df['latitude'].to_numpy(dtype=np.float64)
+    lon = df['longitude'].to_numpy(dtype=np.float64)
+    arrays = {"format": np.array(TILES_FORMAT), "levels": np.array(levels, dtype=np.int64), "cities": cities}
+    for zoom in levels:
+        for name, values in _build_level(lat, lon, city_codes, max(len(cities), 1), zoom).items():
+            arrays[f"z{zoom}_{name}"] = values
+    return DensityTiles(arrays)
+
+
+class DensityTiles:
+    """ Station density per tile at several zoom levels, with viewport queries. """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.levels = tuple(int(z) for z in arrays["levels"])
+        self.cities = arrays["cities"]
+        self.total = int(arrays[f"z{self.levels[0]}_count"].sum()) if self.levels else 0
+
+    def save(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, **self.arrays)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+        if int(arrays["format"]) != TILES_FORMAT:
+            raise ValueError(f"unsupported density tile format {int(arrays['format'])}")
+        return cls(arrays)
+
+    def level_for_zoom(self, zoom):
+        """ The finest stored level not finer than the map zoom (coarsest if zoom is below all). """
+        fitting = [z for z in self.levels if z <= zoom]
+        return max(fitting) if fitting else min(self.levels)
+
+    def _window(self, bbox, level):
+        x0, y0, w, h = self.arrays[f"z{level}_window"]
+        lat_min, lon_min, lat_max, lon_max = bbox
+        (xa, xb), (ya, yb) = tile_xy([lat_max, lat_min], [lon_min, lon_max], level)
+        # Clip to the level's window, in window-relative coordinates (half-open)
+        c0, c1 = max(xa - x0, 0), min(xb - x0 + 1, w)
+        r0, r1 = max(ya - y0, 0), min(yb - y0 + 1, h)
+        return int(c0), int(c1), int(r0), int(r1), int(w)
+
+    def count(self, bbox, level):
+        """ Stations in the tiles overlapping bbox (lat_min, lon_min, lat_max, lon_max); O(1). """
+        c0, c1, r0, r1, _ = self._window(bbox, level)
+        if c0 >= c1 or r0 >= r1:
+            return 0
+        sat = self.arrays[f"z{level}_sat"]
+        return int(sat[r1, c1]) - int(sat[r0, c1]) - int(sat[r1, c0]) + int(sat[r0, c0])
+
+    def query(self, bbox, zoom):
+        """
+        Occupied tiles overlapping bbox at the level chosen for `zoom`, as a
+        DataFrame with latitude/longitude (station centroid), count and city.
+        Cost is one binary search per tile row plus the size of the result.
+        """
+        level = self.level_for_zoom(zoom)
+        c0, c1, r0, r1, w = self._window(bbox, level)
+        cells, row_ptr = self.arrays[f"z{level}_cells"], self.arrays[f"z{level}_row_ptr"]
+        picked = []
+        for r in range(r0, max(r0, r1)):
+            lo, hi = row_ptr[r], row_ptr[r + 1]
+            if lo == hi:
+                continue
+            row = cells[lo:hi] - r * w
+            a, b = np.searchsorted(row, [c0, c1])
+            if a < b:
+                picked.append(np.arange(lo + a, lo + b))
+        idx = np.concatenate(picked) if picked else np.zeros(0, dtype=np.int64)
+        return pd.DataFrame({
+            'latitude': self.arrays[f"z{level}_lat"][idx].astype(np.float64),
+            'longitude': self.arrays[f"z{level}_lon"][idx].astype(np.float64),
+            'count': self.arrays[f"z{level}_count"][idx].astype(np.int64),
+            'city': self.cities[self.arrays[f"z{level}_city"][idx]],
+        })
+
+    def bounds(self):
+        """ Bounding box of all stations' tiles at the finest level ((0, 0, 0, 0) when there are none). """
+        if not self.total:
+            return 0.0, 0.0, 0.0, 0.0
+        level = max(self.levels)
+        x0, y0, w, h = self.arrays[f"z{level}_window"]
+        lat_min, lon_min, _, _ = tile_bounds(x0, y0 + h - 1, level)
+        _, _, lat_max, lon_max = tile_bounds(x0 + w - 1, y0, level)
+        return float(lat_min), float(lon_min), float(lat_max), float(lon_max)
+
+
+def _tiles_path(dataset_version):
+    return os.path.join(get_cache_dir("tiles", dataset_version[:16]), "density.npz")
+
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+def get_density_tiles(source=STATION_DATA_PATH):
+    """ Tiles for the current dataset: memoized, loaded from disk, or built and stored. """
+    path = _tiles_path(station_data_version(source))
+    with _memo_lock:
+        if path in _memo:
+            return _memo[path]
+    tiles = None
+    if os.path.exists(path):
+        try:
+            tiles = DensityTiles.load(path)
+        except (ValueError, KeyError):
+            tiles = None
+    if tiles is None:
+        tiles = build_density_tiles(load_stations(source, columns=['latitude', 'longitude', 'city']))
+        tiles.save(path)
+    with _memo_lock:
+        _memo[path] = tiles
+    return tiles
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default=STATION_DATA_PATH)
+    args = parser.parse_args(argv)
+    t0 = time.perf_counter()
+    tiles = build_density_tiles(load_stations(args.data, columns=['latitude', 'longitude', 'city']))
+    path = tiles.save(_tiles_path(station_data_version(args.data)))
+    print(f"{tiles.total} stations in {time.perf_counter() - t0:.2f} s -> {path} "
+          f"({os.path.getsize(path) / 1024:.0f} KB)")
+    for zoom in tiles.levels:
+        print(f"  z{zoom:<3} {len(tiles.arrays[f'z{zoom}_cells']):>6} tiles")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+
+from lazy_utils import lazy_import
+from preprocessing.station_store import STATION_DATA_PATH, load_stations
+
+sklearn_neighbors = lazy_import("sklearn.neighbors")
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class StationIndex:
+    """
+    Haversine BallTree over the shipped EV station dataset.
+    Built once per process; queries take milliseconds and need no network.
+    """
+
+    def __init__(self, df):
+        self.stations = df.reset_index(drop=True)
+        self.coords = self.stations[['latitude', 'longitude']].to_numpy(dtype=np.float64)
+        self.tree = sklearn_neighbors.BallTree(np.radians(self.coords), metric='haversine')
+
+    def __len__(self):
+        return len(self.stations)
+
+    def nearest(self, lat, lon, k=5):
+        """ The k stations closest to (lat, lon), with a `distance_km` column. """
+        k = min(k, len(self))
+        if k == 0:
+            return self.stations.iloc[:0].assign(distance_km=[])
+        dist, idx = self.tree.query(np.radians([[lat, lon]]), k=k)
+        result = self.stations.iloc[idx[0]].copy()
+        result['distance_km'] = dist[0] * EARTH_RADIUS_KM
+        return result
+
+    def along_route(self, route_path, corridor_km=5.0):
+        """
+        All stations within corridor_km of the route, in one batched pass.
+
+        Stations are first filtered by the route's padded bounding box, then each
+        remaining station finds its nearest route point through a tree built on
+        the route, densified to at most corridor_km / 8 between points so long
+        straight segments with sparse vertices do not hide stations beside the
+        road. Adds `route_index` (nearest original vertex) and `distance_km`,
+        sorted by position along the route.
+        """
+        route = np.asarray(route_path, dtype=np.float64).reshape(-1, 2)
+        if len(route) == 0:
+            return self.stations.iloc[:0].assign(route_index=[], distance_km=[])
+        pad_lat = corridor_km / 111.0
+        pad_lon = corridor_km / (111.0 * max(np.cos(np.radians(np.abs(route[:, 0]).max())), 1e-6))
+        lat_min, lon_min = route.min(axis=0)
+        lat_max, lon_max = route.max(axis=0)
+        lat, lon = self.coords[:, 0], self.coords[:, 1]
+        in_box = np.flatnonzero(
+            (lat >= lat_min - pad_lat) & (lat <= lat_max + pad_lat)
+            & (lon >= lon_min - pad_lon) & (lon <= lon_max + pad_lon)
+        )
+        if len(in_box) == 0:
+            return self.stations.iloc[:0].assign(route_index=[], distance_km=[])
+
+        # Distance to the nearest point overstates the distance to the road by at most
+        # step^2 / (8 * corridor_km) at the corridor's edge: 0.2% of it (10 m at 5 km)
+        points, point_vertex = _densify(route, corridor_km / 8)
+        route_tree = sklearn_neighbors.BallTree(np.radians(points), metric='haversine')
+        dist, nearest = route_tree.query(np.radians(self.coords[in_box]), k=1)
+        dist_km = dist[:, 0] * EARTH_RADIUS_KM
+        keep = dist_km <= corridor_km
+
+        result = self.stations.iloc[in_box[keep]].copy()
+        result['route_index'] = point_vertex[nearest[keep, 0]]
+        result['distance_km'] = dist_km[keep]
+        return result.sort_values(['route_index', 'distance_km'])
+
+
+def _densify(route, max_step_km):
+    """
+    Points along `route` (n, 2 lat/lon) with at most max_step_km between
+    neighbours, interpolated linearly within each segment, and for each point
+    the index of the original vertex it is closest to along its segment.
+    """
+    lat = np.radians(route[:, 0])
+    dlat, dlon = np.diff(lat), np.diff(np.radians(route[:, 1]))
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    seg_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+    steps = np.maximum(np.ceil(seg_km / max_step_km), 1).astype(np.int64)
+    seg = np.repeat(np.arange(len(steps)), steps)
+    t = (np.arange(len(seg)) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(steps, steps)
+    points = route[seg] + (route[seg + 1] - route[seg]) * t[:, None]
+    return np.vstack([points, route[-1:]]), np.append(seg + (t >= 0.5), len(route) - 1)
+
+
+def parse_power_kw(capacity):
+    """ '142.00 kW' -> 142.0; missing or unparseable values become NaN. """
+    return capacity.astype("string").str.extract(r"([\d.]+)", expand=False).astype(float)
+
+
+def load_indexed_stations(path=STATION_DATA_PATH):
+    df = load_stations(path, columns=['latitude', 'longitude', 'name', 'city', 'capacity', 'station_type'])
+    df = df.dropna(subset=['latitude', 'longitude', 'name', 'city'])
+    return df.assign(power_kw=parse_power_kw(df['capacity'])).drop(columns='capacity')
+
+
+def to_place_records(stations):
+    """ Shape index results like MapmyIndia 'suggestedLocations' so the planner can render either. """
+    return [
+        {
+            "placeName": row.name_,
+            "placeAddress": row.city,
+            "distance": int(round(row.distance_km * 1000)),
+            "eLoc": "",
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+        }
+        for row in stations.rename(columns={'name': 'name_'}).itertuples(index=False)
+    ]
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+def get_station_index(path=STATION_DATA_PATH):
+    """ Process-wide index over the station dataset, built on first use. """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = StationIndex(load_indexed_stations(path))
+        return _default_index
@@ -0,0 +1,233 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache_utils import get_cache_dir
+
+# Off unless EVISION_TIMING=1; disabled spans are a shared no-op object
+ENABLED = os.environ.get("EVISION_TIMING", "").lower() in ("1", "true", "yes")
+# Prometheus text file, rewritten after every trace (default: <cache>/metrics/evision.prom)
+METRICS_FILE = os.environ.get("EVISION_METRICS_FILE")
+# Serve /metrics on this port when set, on METRICS_HOST (loopback unless opened up explicitly)
+METRICS_PORT = os.environ.get("EVISION_METRICS_PORT")
+METRICS_HOST = os.environ.get("EVISION_METRICS_HOST", "127.0.0.1")
+# Append one JSON line per trace to this file when set (otherwise only the logger gets them)
+TIMING_LOG = os.environ.get("EVISION_TIMING_LOG")
+BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("evision.timing")
+if ENABLED and TIMING_LOG:
+    _handler = logging.FileHandler(TIMING_LOG)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+class _NoOp:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoOp()
+_current = contextvars.ContextVar("evision_trace", default=None)
+
+
+class StageMetrics:
+    """ Per (trace, stage) latency histograms, rendered in Prometheus text format. """
+
+    def __init__(self, buckets=BUCKETS_S):
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, trace, stage, seconds):
+        with self._lock:
+            series = self._series.get((trace, stage))
+            if series is None:
+                series = self._series[(trace, stage)] = [0, 0.0, [0] * len(self.buckets)]
+            series[0] += 1
+            series[1] += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[2][i] += 1
+
+    def render(self):
+        lines = [
+            "# HELP evision_stage_seconds Time spent in each pipeline stage.",
+            "# TYPE evision_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (trace, stage), (count, total, buckets) in sorted(self._series.items()):
+                labels = f'trace="{trace}",stage="{stage}"'
+                for bound, n in zip(self.buckets, buckets):
+                    lines.append(f'evision_stage_seconds_bucket{{{labels},le="{bound}"}} {n}')
+                lines.append(f'evision_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"evision_stage_seconds_sum{{{labels}}} {total:.6f}")
+                lines.append(f"evision_stage_seconds_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+METRICS = StageMetrics()
+
+
+class Trace:
+    """ One run of a pipeline (a trip plan, a page render) and its stage spans. """
+    __slots__ = ("name", "attrs", "spans", "started", "total_s")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.spans = []   # (stage, start offset s, duration s)
+        self.started = time.perf_counter()
+        self.total_s = None
+
+    def to_record(self):
+        return {
+            "trace": self.name,
+            **self.attrs,
+            "total_ms": round(self.total_s * 1000, 3) if self.total_s is not None else None,
+            "spans": [{"stage": s, "start_ms": round(o * 1000, 3), "ms": round(d * 1000, 3)} for s, o, d in self.spans],
+        }
+
+
+class _Span:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter()
+        trace = _current.get()
+        duration = t1 - self.t0
+        if trace is not None:
+            trace.spans.append((self.stage, self.t0 - trace.started, duration))
+        METRICS.observe(trace.name if trace is not None else "", self.stage, duration)
+        return False
+
+
+class _TraceScope:
+    __slots__ = ("trace", "token")
+
+    def __init__(self, name, attrs):
+        self.trace = Trace(name, attrs)
+
+    def __enter__(self):
+        self.token = _current.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc):
+        _current.reset(self.token)
+        trace = self.trace
+        trace.total_s = time.perf_counter() - trace.started
+        METRICS.observe(trace.name, "total", trace.total_s)
+        logger.info(json.dumps(trace.to_record(), default=str))
+        _export()
+        return False
+
+
+def span(stage):
+    """
+    Times one stage: `with span("route"): ...`. Recorded into the enclosing
+    trace (if any) and the stage histograms. A no-op when timing is disabled.
+    """
+    return _Span(stage) if ENABLED else _NOOP
+
+
+def trace(name, **attrs):
+    """
+    Groups the spans of one run: `with trace("plan_trip", city=c) as t: ...`.
+    On exit logs one JSON line to the `evision.timing` logger and refreshes
+    the metrics file. Yields None when timing is disabled.
+    """
+    return _TraceScope(name, attrs) if ENABLED else _NOOP
+
+
+def start_trace(name, **attrs):
+    """
+    Non-`with` form of trace() for Streamlit scripts, whose st.stop() calls
+    make a single enclosing block awkward. Pair with finish_trace().
+    """
+    if not ENABLED:
+        return None
+    scope = _TraceScope(name, attrs)
+    scope.__enter__()
+    return scope
+
+
+def finish_trace(scope):
+    """ Ends a start_trace() scope; returns its record (None when disabled). """
+    if scope is None:
+        return None
+    scope.__exit__(None, None, None)
+    return scope.trace.to_record()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = METRICS.render().encode()
+        self.send_response(200 if self.path in ("/", "/metrics") else 404)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port, host=None):
+    """ Serves the stage histograms on http://<host>:<port>/metrics (once per process). """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host or METRICS_HOST, int(port)), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
+
+
+def _export():
+    try:
+        path = METRICS_FILE or os.path.join(get_cache_dir("metrics"), "evision.prom")
+        METRICS.write_textfile(path)
+        if METRICS_PORT:
+            start_metrics_server(METRICS_PORT)
+    except OSError as e:
+        logger.warning("Could not export timing metrics: %s", e)
+
+
+def show_timing_panel(record, title="⏱️ Timing breakdown"):
+    """ Streamlit expander with the stage breakdown of a trace record (Trace.to_record()). """
+    if not record:
+        return
+    import streamlit as st
+    total = record["total_ms"] or sum(s["ms"] for s in record["spans"]) or 1.0
+    with st.expander(title):
+        st.caption(f"Total {total:.0f} ms")
+        st.dataframe(
+            [{"Stage": s["stage"], "ms": round(s["ms"], 1), "Share": f"{s['ms'] / total:.0%}"} for s in record["spans"]],
+            use_container_width=True,
+        )
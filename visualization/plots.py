@@ -1,13 +1,91 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
+import io
+import os
 
-def plot_clusters(df, k):
+import numpy as np
+import pandas as pd
+
+from cache_utils import get_cache_dir
+from lazy_utils import lazy_import
+
+# Only needed when a plot is not in the PNG cache
+plt = lazy_import("matplotlib.pyplot")
+sns = lazy_import("seaborn")
+
+# Above this many stations individual points are replaced by a hexbin density layer
+DENSITY_THRESHOLD = 5000
+# Upper bound on text labels drawn per figure
+MAX_LABELS = 40
+
+
+def _label_subset(df, max_labels=MAX_LABELS):
+    """
+    Row positions to label, thinned by density: the map extent is split into a
+    grid, the first station of each occupied cell is a candidate, the busiest
+    cells win, and repeated (cluster, text) pairs are dropped.
+    """
+    if len(df) == 0:
+        return np.zeros(0, dtype=np.intp)
+    lon = df['longitude'].to_numpy(dtype=np.float64)
+    lat = df['latitude'].to_numpy(dtype=np.float64)
+    bins = max(1, int(np.ceil(np.sqrt(max_labels))))
+    span_x = max(np.ptp(lon), 1e-9)
+    span_y = max(np.ptp(lat), 1e-9)
+    ix = np.minimum(((lon - lon.min()) / span_x * bins).astype(np.intp), bins - 1)
+    iy = np.minimum(((lat - lat.min()) / span_y * bins).astype(np.intp), bins - 1)
+    cells, first, counts = np.unique(iy * bins + ix, return_index=True, return_counts=True)
+    chosen = first[np.argsort(-counts, kind="stable")[:max_labels]]
+
+    picked = df.iloc[chosen][['Cluster', 'city']].astype(str)
+    keep = ~picked.duplicated().to_numpy()
+    return np.sort(chosen[keep])
+
+
+def plot_clusters(df, k, max_labels=MAX_LABELS, density_threshold=DENSITY_THRESHOLD):
     fig, ax = plt.subplots()
     palette = sns.color_palette("bright", k)
-    sns.scatterplot(data=df, x='longitude', y='latitude', hue='Cluster', palette=palette, ax=ax)
-    for i, row in df.iterrows():
-        ax.text(row['longitude'], row['latitude'], row['city'], fontsize=7, alpha=0.6)
+    if len(df) <= density_threshold:
+        sns.scatterplot(data=df, x='longitude', y='latitude', hue='Cluster', palette=palette, ax=ax)
+    else:
+        # Large inputs: one rasterized density layer plus cluster centroids
+        ax.hexbin(df['longitude'], df['latitude'], gridsize=60, bins='log', cmap='Greys', mincnt=1, rasterized=True)
+        centers = df.groupby('Cluster', observed=True)[['longitude', 'latitude']].mean()
+        for color, (cluster, row) in zip(palette, centers.iterrows()):
+            ax.scatter(row['longitude'], row['latitude'], color=color, edgecolor='black', s=80, label=str(cluster))
+        ax.legend(title='Cluster')
+
+    rows = _label_subset(df, max_labels)
+    for lon, lat, text in zip(df['longitude'].to_numpy()[rows], df['latitude'].to_numpy()[rows], df['city'].to_numpy()[rows]):
+        ax.text(lon, lat, text, fontsize=7, alpha=0.6)
     plt.xlabel("Longitude")
     plt.ylabel("Latitude")
     plt.title(f"EV Stations Clustered into {k} Regions")
     return fig
+
+
+def clusters_data_hash(df):
+    """ Stable hash of the columns plot_clusters draws. """
+    cols = df[['latitude', 'longitude', 'Cluster', 'city']]
+    return format(int(pd.util.hash_pandas_object(cols, index=False).sum()) & (2 ** 64 - 1), "016x")
+
+
+def render_clusters_png(df, k, city, dpi=100):
+    """
+    PNG bytes of plot_clusters(df, k), cached on disk by (city, k, data hash)
+    so reruns with the same clustering skip matplotlib entirely.
+    """
+    slug = "".join(ch if ch.isalnum() else "-" for ch in str(city).lower())
+    path = os.path.join(get_cache_dir("plots"), f"{slug}_k{k}_{clusters_data_hash(df)}.png")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    fig = plot_clusters(df, k)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+    png = buf.getvalue()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(png)
+    os.replace(tmp, path)
+    return png
@@ -0,0 +1,126 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from lazy_utils import lazy_import
+from routing.geometry import ZOOM_TOLERANCE_M, simplify_for_zoom
+
+# Only needed when a map is not in the HTML cache
+folium = lazy_import("folium")
+branca_element = lazy_import("branca.element")
+jinja2 = lazy_import("jinja2")
+
+# One simplified line per ZOOM_TOLERANCE_M level up to this zoom, each shown only
+# in its zoom range; deeper zooms keep the finest of them.
+ROUTE_DETAIL_ZOOM = 10
+MAP_CACHE_SIZE = 64
+
+# Shows the line of the current zoom range on every zoom change
+_LEVEL_SWITCH_JS = """
+{% macro script(this, kwargs) %}
+(function() {
+    var map = {{ this._parent.get_name() }};
+    var levels = [{% for lo, hi, layer in this.levels %}[{{ lo }}, {{ hi }}, {{ layer.get_name() }}],{% endfor %}];
+    function showLevel() {
+        var zoom = map.getZoom();
+        levels.forEach(function(level) {
+            if (zoom >= level[0] && zoom < level[1]) { map.addLayer(level[2]); } else { map.removeLayer(level[2]); }
+        });
+    }
+    map.on("zoomend", showLevel);
+    showLevel();
+})();
+{% endmacro %}
+"""
+
+
+def zoom_bands(detail_zoom=ROUTE_DETAIL_ZOOM):
+    """
+    [(level, zoom_from, zoom_to)]: the ZOOM_TOLERANCE_M level drawn for map
+    zooms in [zoom_from, zoom_to). The first band starts at zoom 0 and the
+    last one, the finest level not above detail_zoom, has no upper end.
+    """
+    levels = [z for z in sorted(ZOOM_TOLERANCE_M) if z <= detail_zoom] or [min(ZOOM_TOLERANCE_M)]
+    bounds = [0] + levels[1:] + [99]
+    return [(level, bounds[i], bounds[i + 1]) for i, level in enumerate(levels)]
+
+
+def _level_switch(levels):
+    element = branca_element.MacroElement()
+    element._name = "RouteLevelSwitch"
+    element._template = jinja2.Template(_LEVEL_SWITCH_JS)
+    element.levels = levels
+    return element
+
+
+def route_map_key(route_path, stops, detail_zoom=ROUTE_DETAIL_ZOOM):
+    digest = hashlib.sha1(np.ascontiguousarray(route_path, dtype=np.float64).tobytes())
+    digest.update(repr((stops, detail_zoom)).encode())
+    return digest.hexdigest()
+
+
+def build_route_map(start, end, route_path, stops, detail_zoom=ROUTE_DETAIL_ZOOM):
+    m = folium.Map(location=[start[0], start[1]], zoom_start=7)
+    # Opens on the whole route; the level switch then picks the line for that zoom
+    route = np.asarray(route_path, dtype=np.float64).reshape(-1, 2)
+    m.fit_bounds([route.min(axis=0).tolist(), route.max(axis=0).tolist()])
+    levels = []
+    for level, zoom_from, zoom_to in zoom_bands(detail_zoom):
+        layer = folium.FeatureGroup(name=f"route_z{level}", control=False)
+        folium.PolyLine(simplify_for_zoom(route_path, level).tolist(), weight=5, color="blue", opacity=0.8,
+                        tooltip="Planned EV Route").add_to(layer)
+        layer.add_to(m)
+        levels.append((zoom_from, zoom_to, layer))
+    _level_switch(levels).add_to(m)
+
+    for idx, (name, lat, lon) in enumerate(stops):
+        if idx == 0:
+            icon_color, icon_emoji, marker_title = "green", "🚗", "Start Point"
+        elif idx == len(stops) - 1:
+            icon_color, icon_emoji, marker_title = "red", "🏁", "Destination"
+        else:
+            icon_color, icon_emoji, marker_title = "orange", "⚡", f"Charging Stop {idx}"
+
+        if idx == 0: map_link = f"https://maps.mapmyindia.com/{start[0]},{start[1]}"
+        elif idx == len(stops) - 1: map_link = f"https://maps.mapmyindia.com/{end[0]},{end[1]}"
+        else:
+            eloc = name.split()[-1] if len(name.split()) == 1 else ""
+            map_link = f"https://maps.mapmyindia.com/{eloc}" if eloc else f"https://maps.mapmyindia.com/{lat},{lon}"
+
+        popup_html = f"""<div style='font-size:14px; line-height:1.6'>
+            <b>{icon_emoji} {marker_title}</b><br>
+            <b>Name:</b> {name}<br>
+            📍 <b>Coordinates:</b> {round(lat, 4)}, {round(lon, 4)}<br>
+            <a href="{map_link}" target="_blank">🔗 View in MapmyIndia</a>
+        </div>"""
+        folium.Marker(
+            location=[lat, lon],
+            popup=folium.Popup(popup_html, max_width=300),
+            icon=folium.Icon(color=icon_color, icon="info-sign")
+        ).add_to(m)
+    return m
+
+
+_html_cache = OrderedDict()
+_html_cache_lock = threading.Lock()
+
+def get_route_map_html(start, end, route_path, stops, detail_zoom=ROUTE_DETAIL_ZOOM):
+    """
+    Standalone HTML of the route map, cached by route hash (bounded LRU shared
+    by all sessions), so redisplaying a plan never rebuilds the folium object.
+    """
+    key = route_map_key(route_path, stops, detail_zoom)
+    with _html_cache_lock:
+        html = _html_cache.get(key)
+        if html is not None:
+            _html_cache.move_to_end(key)
+            return html
+
+    html = build_route_map(start, end, route_path, stops, detail_zoom).get_root().render()
+    with _html_cache_lock:
+        _html_cache[key] = html
+        while len(_html_cache) > MAP_CACHE_SIZE:
+            _html_cache.popitem(last=False)
+    return html